@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from aiohttp import web, WSMsgType
+
+from main import MCPChatbot
+from mcp_host import MCPHost
+
+logger = logging.getLogger(__name__)
+
+class AdmissionController:
+    """Caps the chat turns running at once; a bounded number wait for a slot, the rest are turned away"""
+    
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, queue_timeout: float = 30.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._slots = asyncio.Semaphore(max_concurrent)
+    
+    @classmethod
+    def from_config(cls, server_config: Dict) -> "AdmissionController":
+        """Build a controller from the chat_server block"""
+        return cls(
+            max_concurrent=server_config.get("max_concurrent_turns", 4),
+            max_queue=server_config.get("max_queued_turns", 16),
+            queue_timeout=server_config.get("queue_timeout", 30.0)
+        )
+    
+    async def admit(self) -> Optional[str]:
+        """Wait for a turn slot; returns None once admitted, or the reason the turn was rejected"""
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            return f"server busy: {self.in_flight} turns running and {self.waiting} queued"
+        
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return f"no turn slot became free within {self.queue_timeout:.0f}s"
+        finally:
+            self.waiting -= 1
+        
+        waited = time.perf_counter() - started
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.admitted += 1
+        self.in_flight += 1
+        return None
+    
+    def release(self):
+        """Free the slot of a finished turn"""
+        self.in_flight -= 1
+        self._slots.release()
+    
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait before retrying"""
+        return max(1, round(self.queue_timeout / 4))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters reported by GET /stats"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_queue_wait": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+            "max_queue_wait": round(self.max_wait, 3)
+        }
+
+class ChatSession:
+    """One user's conversation: its own chatbot state on the shared host and Ollama client"""
+    
+    def __init__(self, session_id: str, chatbot: MCPChatbot):
+        self.session_id = session_id
+        self.chatbot = chatbot
+        # A session runs one turn at a time, since each turn builds on the previous one
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_active = time.time()
+        self.turns = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary reported by GET /stats"""
+        return {
+            "session_id": self.session_id,
+            "age": round(time.time() - self.created_at, 1),
+            "idle": round(time.time() - self.last_active, 1),
+            "turns": self.turns,
+            "busy": self.lock.locked(),
+            "context": self.chatbot.context.stats()
+        }
+
+class ChatServer:
+    """Serves many concurrent chat sessions over HTTP and WebSocket from one MCPHost and Ollama client"""
+    
+    def __init__(self, primary: MCPChatbot):
+        server_config = primary.mcp_host.config.get("chat_server", {})
+        # The chatbot that started the servers and warmed up the model; sessions share its host and client
+        self.primary = primary
+        self.max_sessions = server_config.get("max_sessions", 100)
+        self.session_ttl = server_config.get("session_ttl", 1800.0)
+        self.admission = AdmissionController.from_config(server_config)
+        self.sessions: Dict[str, ChatSession] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.app = web.Application()
+        self.app.add_routes([
+            web.post("/sessions", self.create_session),
+            web.delete("/sessions/{session_id}", self.delete_session),
+            web.post("/sessions/{session_id}/chat", self.chat),
+            web.get("/sessions/{session_id}/ws", self.websocket),
+            web.get("/stats", self.stats)
+        ])
+        self.app.on_startup.append(self._start_reaper)
+        self.app.on_cleanup.append(self._close_sessions)
+    
+    def _new_session(self) -> Optional[ChatSession]:
+        """Open a session, or return None when max_sessions are open"""
+        if len(self.sessions) >= self.max_sessions:
+            return None
+        session_id = uuid.uuid4().hex
+        chatbot = MCPChatbot(mcp_host=self.primary.mcp_host, ollama=self.primary.ollama, session_id=session_id)
+        session = ChatSession(session_id, chatbot)
+        self.sessions[session.session_id] = session
+        logger.info(f"Opened chat session {session.session_id} ({len(self.sessions)} open)")
+        return session
+    
+    async def _close_session(self, session: ChatSession):
+        """Forget a session and stop its background summarization"""
+        self.sessions.pop(session.session_id, None)
+        session.chatbot.context.clear()
+        logger.info(f"Closed chat session {session.session_id} after {session.turns} turns")
+    
+    async def _run_turn(self, session: ChatSession, message: str) -> Dict[str, Any]:
+        """Run one chat turn under admission control; returns the reply or the rejection"""
+        if session.lock.locked():
+            return {"error": "a turn is already running in this session", "status": 409}
+        
+        async with session.lock:
+            rejection = await self.admission.admit()
+            if rejection:
+                logger.warning(f"Rejected turn of session {session.session_id}: {rejection}")
+                return {"error": rejection, "status": 429, "retry_after": self.admission.retry_after()}
+            
+            try:
+                reply = await session.chatbot.chat(message)
+            finally:
+                self.admission.release()
+            session.turns += 1
+            session.last_active = time.time()
+            return {"reply": reply, "metrics": session.chatbot.last_turn_metrics}
+    
+    def _session_or_404(self, request: web.Request) -> ChatSession:
+        """The session named in the URL"""
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "unknown session"}), content_type="application/json")
+        session.last_active = time.time()
+        return session
+    
+    async def create_session(self, request: web.Request) -> web.Response:
+        """POST /sessions: open a session"""
+        session = self._new_session()
+        if session is None:
+            return web.json_response({"error": f"session limit of {self.max_sessions} reached"}, status=503,
+                                     headers={"Retry-After": str(self.admission.retry_after())})
+        return web.json_response({"session_id": session.session_id}, status=201)
+    
+    async def delete_session(self, request: web.Request) -> web.Response:
+        """DELETE /sessions/{id}: close a session"""
+        await self._close_session(self._session_or_404(request))
+        return web.json_response({"closed": True})
+    
+    async def chat(self, request: web.Request) -> web.Response:
+        """POST /sessions/{id}/chat with {"message": ...}: run a turn and return the whole reply"""
+        session = self._session_or_404(request)
+        try:
+            message = (await request.json()).get("message", "").strip()
+        except (json.JSONDecodeError, AttributeError):
+            message = ""
+        if not message:
+            return web.json_response({"error": "expected a JSON body with a non-empty \"message\""}, status=400)
+        
+        result = await self._run_turn(session, message)
+        if "error" in result:
+            headers = {"Retry-After": str(result["retry_after"])} if "retry_after" in result else None
+            return web.json_response({"error": result["error"]}, status=result["status"], headers=headers)
+        return web.json_response(result)
+    
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """GET /sessions/{id}/ws: turns as {"message": ...} frames, replies streamed back as events"""
+        session = self._session_or_404(request)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        
+        # Tokens and progress arrive through synchronous callbacks, so a writer task sends them in order
+        outbox: asyncio.Queue = asyncio.Queue()
+        
+        async def write_events():
+            while True:
+                event = await outbox.get()
+                if event is None or ws.closed:
+                    return
+                await ws.send_json(event)
+        
+        writer = asyncio.create_task(write_events())
+        session.chatbot.on_token = lambda token: outbox.put_nowait({"type": "token", "text": token})
+        session.chatbot.on_progress = lambda progress: outbox.put_nowait({"type": "progress", **progress})
+        try:
+            async for frame in ws:
+                if frame.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    message = json.loads(frame.data).get("message", "").strip()
+                except (json.JSONDecodeError, AttributeError):
+                    message = ""
+                if not message:
+                    outbox.put_nowait({"type": "error", "error": "expected {\"message\": ...}"})
+                    continue
+                
+                result = await self._run_turn(session, message)
+                if "error" in result:
+                    outbox.put_nowait({"type": "error", "error": result["error"],
+                                       "retry_after": result.get("retry_after")})
+                else:
+                    outbox.put_nowait({"type": "reply", "text": result["reply"], "metrics": result["metrics"]})
+        finally:
+            session.chatbot.on_token = None
+            session.chatbot.on_progress = None
+            outbox.put_nowait(None)
+            await writer
+        return ws
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        """GET /stats: admission, LLM scheduler and backend counters and open sessions"""
+        scheduler = self.primary.ollama.scheduler
+        return web.json_response({
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "admission": self.admission.stats(),
+            "llm_scheduler": scheduler.stats() if scheduler else None,
+            "ollama_backends": self.primary.ollama.stats(),
+            "session_list": [session.to_dict() for session in self.sessions.values()]
+        })
+    
+    async def _start_reaper(self, app: web.Application):
+        """Start closing sessions that have been idle for session_ttl"""
+        self._reaper_task = asyncio.create_task(self._reap_idle_sessions())
+    
+    async def _reap_idle_sessions(self):
+        """Close idle sessions so abandoned conversations do not hold memory forever"""
+        while True:
+            await asyncio.sleep(min(self.session_ttl, 60.0))
+            cutoff = time.time() - self.session_ttl
+            for session in list(self.sessions.values()):
+                if session.last_active < cutoff and not session.lock.locked():
+                    await self._close_session(session)
+    
+    async def _close_sessions(self, app: web.Application):
+        """Stop the reaper and close every session"""
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        for session in list(self.sessions.values()):
+            await session.chatbot.context.wait()
+            await self._close_session(session)
+
+async def main():
+    """Run the multi-session chat server until interrupted"""
+    parser = argparse.ArgumentParser(description="Multi-session MCP chat server")
+    parser.add_argument("--config", default="config/mcp_config.json", help="Path to mcp_config.json")
+    parser.add_argument("--host", help="Address to listen on (default: chat_server.host)")
+    parser.add_argument("--port", type=int, help="Port to listen on (default: chat_server.port)")
+    options = parser.parse_args()
+    
+    primary = MCPChatbot(mcp_host=MCPHost(options.config))
+    try:
+        if not await primary.initialize():
+            return
+        
+        server_config = primary.mcp_host.config.get("chat_server", {})
+        server = ChatServer(primary)
+        runner = web.AppRunner(server.app)
+        await runner.setup()
+        address = options.host or server_config.get("host", "127.0.0.1")
+        port = options.port or server_config.get("port", 8080)
+        await web.TCPSite(runner, address, port).start()
+        logger.info(f"Chat server listening on http://{address}:{port}")
+        
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        
+        try:
+            await stop_event.wait()
+        finally:
+            await runner.cleanup()
+    finally:
+        await primary.cleanup()
+
+if __name__ == "__main__":
+    # Ensure required directories exist
+    Path("logs").mkdir(exist_ok=True)
+    Path("papers").mkdir(exist_ok=True)
+    Path("data").mkdir(exist_ok=True)
+    
+    asyncio.run(main())
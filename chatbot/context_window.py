@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_NOTE = "characters truncated]"
+
+# ollama_client returns failures as reply text starting with one of these
+LLM_ERROR_PREFIXES = ("Error communicating with Ollama", "Error from Ollama", "Unexpected error")
+
+SUMMARY_PROMPT = ("Summarize the conversation below in at most {words} words for your own later reference. "
+                  "Keep facts, numbers, file names, paper IDs and open requests the user may refer back to. "
+                  "Reply with the summary only.")
+
+class ContextWindow:
+    """Conversation history kept within a token budget; evicted turns are folded into a rolling summary"""
+    
+    def __init__(self, budget_tokens: int = 3000, keep_recent: int = 4, max_old_message_tokens: int = 300,
+                 summary_tokens: int = 300, chars_per_token: float = 4.0,
+                 llm_chat: Optional[Callable[[List[Dict[str, str]]], Awaitable[str]]] = None):
+        self.budget_tokens = budget_tokens
+        # The newest messages are never truncated or evicted
+        self.keep_recent = keep_recent
+        self.max_old_message_tokens = max_old_message_tokens
+        self.summary_tokens = summary_tokens
+        # Rough token estimate without the model's tokenizer; about 4 characters per token for English
+        self.chars_per_token = chars_per_token
+        # Summarizes evicted turns with the LLM when set; otherwise their first lines are kept
+        self.llm_chat = llm_chat
+        self.messages: List[Dict[str, Any]] = []
+        self.summary = ""
+        self.evicted = 0
+        self.truncated = 0
+        self._compaction: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def from_config(cls, config: Dict,
+                    llm_chat: Optional[Callable[[List[Dict[str, str]]], Awaitable[str]]] = None) -> "ContextWindow":
+        """Build a window from the context block; llm_chat is only used if summarize_with_llm is set"""
+        context_config = config.get("context", {})
+        return cls(
+            budget_tokens=context_config.get("budget_tokens", 3000),
+            keep_recent=context_config.get("keep_recent", 4),
+            max_old_message_tokens=context_config.get("max_old_message_tokens", 300),
+            summary_tokens=context_config.get("summary_tokens", 300),
+            chars_per_token=context_config.get("chars_per_token", 4.0),
+            llm_chat=llm_chat if context_config.get("summarize_with_llm", True) else None
+        )
+    
+    def count(self, message: Dict[str, Any]) -> int:
+        """Estimated tokens of a message, including a few for its role and framing"""
+        text = message.get("content") or ""
+        if message.get("tool_calls"):
+            text += json.dumps(message["tool_calls"])
+        return int(len(text) / self.chars_per_token) + 4
+    
+    def _summary_message(self) -> Optional[Dict[str, str]]:
+        """The rolling summary as a message placed after the system prompt"""
+        if not self.summary:
+            return None
+        return {"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}
+    
+    def tokens(self) -> int:
+        """Estimated tokens of the summary and the kept messages"""
+        summary = self._summary_message()
+        return (self.count(summary) if summary else 0) + sum(self.count(message) for message in self.messages)
+    
+    async def build(self, system_prompt: str) -> List[Dict[str, Any]]:
+        """Messages for the next request: system prompt, summary, then the newest messages within the budget"""
+        # A summary still being written is not waited for: it runs at background priority and would hold up
+        # this turn behind other sessions' interactive generations. The window is trimmed to the budget
+        # below, and the summary is folded in once it lands.
+        
+        # The system prompt stays first and unchanged so Ollama can reuse its cached prefix
+        messages = [{"role": "system", "content": system_prompt}]
+        summary = self._summary_message()
+        used = 0
+        if summary:
+            messages.append(summary)
+            used = self.count(summary)
+        
+        window = []
+        for message in reversed(self.messages):
+            cost = self.count(message)
+            if window and used + cost > self.budget_tokens:
+                break
+            window.append(message)
+            used += cost
+        return messages + window[::-1]
+    
+    def schedule_compaction(self):
+        """Compact in the background after a turn so the reply is not held up"""
+        if self._compaction is None or self._compaction.done():
+            self._compaction = asyncio.create_task(self.compact())
+    
+    async def wait(self):
+        """Wait for a running compaction to finish"""
+        if self._compaction is not None:
+            await self._compaction
+            self._compaction = None
+    
+    async def compact(self):
+        """Truncate old long messages, then fold the oldest turns into the summary until the budget holds"""
+        try:
+            limit = int(self.max_old_message_tokens * self.chars_per_token)
+            for index in range(max(len(self.messages) - self.keep_recent, 0)):
+                message = self.messages[index]
+                content = message.get("content") or ""
+                if len(content) > limit and not content.endswith(TRUNCATION_NOTE):
+                    # A file read or paper listing from many turns ago rarely matters beyond its beginning
+                    self.messages[index] = {**message,
+                                            "content": f"{content[:limit]} … [{len(content) - limit} more {TRUNCATION_NOTE}"}
+                    self.truncated += 1
+            
+            # Room is kept for the summary the evicted turns are folded into
+            target = self.budget_tokens - self.summary_tokens
+            total = sum(self.count(message) for message in self.messages)
+            evict = 0
+            while total > target and evict < len(self.messages) - self.keep_recent:
+                total -= self.count(self.messages[evict])
+                evict += 1
+            # Whole turns are evicted, so the window always opens with a user message
+            while 0 < evict < len(self.messages) - 1 and self.messages[evict].get("role") != "user":
+                evict += 1
+            if not evict:
+                return
+            
+            evicted = self.messages[:evict]
+            summary = await self._summarize(evicted)
+            # Messages appended while summarizing are at the end, so the front is still the evicted turns
+            del self.messages[:evict]
+            self.summary = summary
+            self.evicted += evict
+            logger.info(f"Context window: folded {evict} messages into the summary, "
+                        f"{len(self.messages)} kept (~{self.tokens()} tokens)")
+        except Exception as e:
+            logger.error(f"Context compaction failed: {e}")
+    
+    async def _summarize(self, evicted: List[Dict[str, Any]]) -> str:
+        """New rolling summary covering the previous summary and the evicted messages"""
+        transcript = "\n".join(f"{message.get('role')}: {message.get('content') or ''}" for message in evicted)
+        if self.llm_chat is not None:
+            words = int(self.summary_tokens * 0.75)
+            previous = f"Earlier summary: {self.summary}\n\n" if self.summary else ""
+            reply = await self.llm_chat([
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=words)},
+                {"role": "user", "content": f"{previous}Conversation:\n{transcript}"}
+            ])
+            if reply.strip() and not reply.startswith(LLM_ERROR_PREFIXES):
+                return self._clip(reply.strip())
+            logger.warning(f"LLM summary failed, keeping first lines instead: {reply[:200]}")
+        
+        lines = [f"{message.get('role')}: {(message.get('content') or '').strip().splitlines()[0][:160]}"
+                 for message in evicted if (message.get("content") or "").strip()]
+        return self._clip(" | ".join(filter(None, [self.summary] + lines)), keep_end=True)
+    
+    def _clip(self, text: str, keep_end: bool = False) -> str:
+        """Cut text to the summary budget, dropping the oldest part when keep_end is set"""
+        limit = int(self.summary_tokens * self.chars_per_token)
+        if len(text) <= limit:
+            return text
+        return "… " + text[-limit:] if keep_end else text[:limit] + " …"
+    
+    def clear(self):
+        """Forget all messages and the summary (in place, so references to messages stay valid)"""
+        if self._compaction is not None and not self._compaction.done():
+            self._compaction.cancel()
+        self._compaction = None
+        self.messages.clear()
+        self.summary = ""
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the debug command"""
+        summary = self._summary_message()
+        return {
+            "messages": len(self.messages),
+            "tokens": self.tokens(),
+            "budget_tokens": self.budget_tokens,
+            "summary_tokens": self.count(summary) if summary else 0,
+            "evicted": self.evicted,
+            "truncated": self.truncated
+        }
@@ -0,0 +1,229 @@
+import logging
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+NUMBER = r"-?\d+(?:\.\d+)?"
+
+# Politeness and filler around a request that do not change its meaning
+LEADING_FILLER = re.compile(
+    r"^(?:(?:please|hey|ok|okay|can you|could you|would you|will you|what is|what's|whats|"
+    r"calculate|compute|evaluate|tell me|give me|show me|i want to|i'd like to)\s+)+",
+    re.IGNORECASE
+)
+TRAILING_FILLER = re.compile(r"(?:\s+please)?\s*[?.!]*$", re.IGNORECASE)
+
+# Words that join the steps of a request, e.g. "... then save a summary"
+CONJUNCTION = r"(?:then|and|also|after|afterwards|next)"
+# Words that start a further step
+STEP_BREAK = rf"(?:{CONJUNCTION}|save|write)"
+# Free text that stops before a further step, so multi-step requests are left to the LLM
+TOPIC = rf"(?!{STEP_BREAK}\b)[^\s,;]+(?:\s+(?!{STEP_BREAK}\b)[^\s,;]+)*"
+# Verbs that start a request of their own
+STEP_VERB = (r"(?:save|write|read|open|delete|remove|search|find|look|list|show|get|extract|summari[sz]e|"
+             r"add|subtract|multiply|divide|compute|calculate|tell|give)")
+# A conjunction or comma only separates steps when a new request follows it; "multiply 3 and 4" is one step
+MULTI_STEP = re.compile(rf"(?:[,;]|\b{CONJUNCTION}\b)\s+(?:{CONJUNCTION}\s+)?{STEP_VERB}\b", re.IGNORECASE)
+
+def is_multi_step(text: str) -> bool:
+    """Whether a request may chain several steps, e.g. "search papers on X, then save a summary"."""
+    return MULTI_STEP.search(text) is not None
+
+class IntentRule:
+    """Regex patterns for one tool; named groups become the tool's arguments"""
+    
+    def __init__(self, tool: str, patterns: List[str], server: Optional[str] = None, confidence: float = 1.0):
+        self.tool = tool
+        self.server = server
+        self.confidence = confidence
+        self.patterns = [
+            re.compile(pattern.replace("{n}", NUMBER), re.IGNORECASE)
+            for pattern in patterns
+        ]
+    
+    @property
+    def name(self) -> str:
+        """Rule name used in logs and stats"""
+        return f"{self.server}.{self.tool}" if self.server else self.tool
+    
+    @classmethod
+    def from_config(cls, rule_config: Dict[str, Any]) -> "IntentRule":
+        """Build a rule from an entry of intent_router.rules"""
+        return cls(
+            tool=rule_config["tool"],
+            patterns=rule_config["patterns"],
+            server=rule_config.get("server"),
+            confidence=rule_config.get("confidence", 1.0)
+        )
+
+def default_rules() -> List[IntentRule]:
+    """Rules for the bundled servers' non-destructive tools (destructive tools always go through the LLM)"""
+    return [
+        IntentRule("add", [
+            r"(?:add\s+)?(?P<a>{n})\s*(?:\+|plus)\s*(?P<b>{n})",
+            r"add\s+(?P<a>{n})\s+(?:and|to)\s+(?P<b>{n})",
+            r"(?:the\s+)?sum\s+of\s+(?P<a>{n})\s+and\s+(?P<b>{n})"
+        ]),
+        IntentRule("subtract", [
+            r"(?P<a>{n})\s*(?:-|minus)\s*(?P<b>{n})",
+            r"subtract\s+(?P<b>{n})\s+from\s+(?P<a>{n})"
+        ]),
+        IntentRule("multiply", [
+            r"multiply\s+(?P<a>{n})\s+(?:and|by|with|times)\s+(?P<b>{n})",
+            r"(?P<a>{n})\s*(?:\*|\bx\b|×|times|multiplied\s+by)\s*(?P<b>{n})",
+            r"(?:the\s+)?product\s+of\s+(?P<a>{n})\s+and\s+(?P<b>{n})"
+        ]),
+        IntentRule("divide", [
+            r"divide\s+(?P<a>{n})\s+by\s+(?P<b>{n})",
+            r"(?P<a>{n})\s*(?:/|÷|divided\s+by|over)\s*(?P<b>{n})"
+        ]),
+        IntentRule("power", [
+            r"(?P<base>{n})\s*(?:\^|\*\*|to\s+the\s+power\s+of|raised\s+to(?:\s+the\s+power\s+of)?)\s*(?P<exponent>{n})"
+        ]),
+        IntentRule("square_root", [
+            r"(?:the\s+)?(?:square\s+root|sqrt)\s+of\s+(?P<number>{n})",
+            r"(?:sqrt|√)\s*\(?(?P<number>{n})\)?"
+        ]),
+        IntentRule("list_files", [
+            r"(?:(?:list|show)(?:\s+(?:all|the|my))*\s+files|ls)(?:\s+in\s+(?P<directory>\S+))?",
+            r"what\s+files\s+are\s+(?:there|in\s+(?P<directory>\S+))"
+        ], confidence=0.95),
+        IntentRule("read_file", [
+            r"(?:read|cat|open|show)\s+(?:the\s+)?(?:file\s+)?(?P<filename>[\w./-]+\.\w+)(?:\s+in\s+(?P<directory>\S+))?"
+        ], confidence=0.95),
+        IntentRule("extract_info", [
+            r"(?:get\s+|show\s+)?(?:info|information|details)\s+(?:on|about|for)\s+(?:paper\s+)?"
+            r"(?P<paper_id>\d{4}\.\d{4,5}(?:v\d+)?)"
+        ]),
+        IntentRule("search_papers", [
+            r"(?:search|find|look)\s+(?:for\s+)?(?:up\s+)?papers\s+(?:on|about)\s+(?P<topic>" + TOPIC + ")"
+        ], confidence=0.95)
+    ]
+
+class IntentRouter:
+    """Matches high-confidence requests to a tool call so they can skip the LLM entirely"""
+    
+    def __init__(self, catalogue: Callable[[], Dict[str, List[Dict]]], threshold: float = 0.9,
+                 enabled: bool = True, rules: Optional[List[IntentRule]] = None):
+        self.catalogue = catalogue
+        self.threshold = threshold
+        self.enabled = enabled
+        self.rules = rules if rules is not None else default_rules()
+        self.routed = 0
+        self.fell_through = 0
+        self.below_threshold = 0
+        self.rule_hits: Counter = Counter()
+    
+    @classmethod
+    def from_config(cls, config: Dict, catalogue: Callable[[], Dict[str, List[Dict]]]) -> "IntentRouter":
+        """Build a router from the intent_router block; configured rules are tried before the defaults"""
+        router_config = config.get("intent_router", {})
+        rules = [IntentRule.from_config(rule) for rule in router_config.get("rules", [])]
+        if router_config.get("default_rules", True):
+            rules += default_rules()
+        return cls(
+            catalogue=catalogue,
+            threshold=router_config.get("threshold", 0.9),
+            enabled=router_config.get("enabled", True),
+            rules=rules
+        )
+    
+    def register(self, rule: IntentRule, first: bool = True):
+        """Add a rule, by default ahead of the existing ones"""
+        if first:
+            self.rules.insert(0, rule)
+        else:
+            self.rules.append(rule)
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Collapse whitespace and strip filler so patterns can match a request whole"""
+        text = " ".join(text.split())
+        text = LEADING_FILLER.sub("", text)
+        return TRAILING_FILLER.sub("", text)
+    
+    @staticmethod
+    def _find_tool(tools: Dict[str, List[Dict]], rule: IntentRule) -> Optional[Dict]:
+        """Find the rule's tool in the catalogue, returning its server and definition"""
+        for server_name, server_tools in tools.items():
+            if rule.server and server_name != rule.server:
+                continue
+            for tool in server_tools:
+                if tool.get("name") == rule.tool:
+                    return {"server": server_name, "definition": tool}
+        return None
+    
+    @staticmethod
+    def _arguments(groups: Dict[str, Optional[str]], definition: Dict) -> Dict[str, Any]:
+        """Convert matched groups to arguments, typed by the tool's inputSchema"""
+        properties = definition.get("inputSchema", {}).get("properties", {})
+        arguments = {}
+        for name, value in groups.items():
+            if value is None:
+                continue
+            kind = properties.get(name, {}).get("type")
+            if kind in ("number", "integer"):
+                number = float(value)
+                arguments[name] = int(number) if number.is_integer() else number
+            else:
+                arguments[name] = value
+        return arguments
+    
+    def route(self, text: str) -> Optional[Dict[str, Any]]:
+        """Return {server, tool, arguments, confidence, rule} for a confident match, else None"""
+        if not self.enabled:
+            return None
+        
+        normalized = self._normalize(text)
+        tools = self.catalogue()
+        best = None
+        for rule in self.rules:
+            found = self._find_tool(tools, rule)
+            if found is None:
+                continue
+            
+            for pattern in rule.patterns:
+                match = pattern.fullmatch(normalized) or pattern.search(normalized)
+                if match is None:
+                    continue
+                # Text the pattern did not account for lowers confidence
+                coverage = (match.end() - match.start()) / max(len(normalized), 1)
+                confidence = rule.confidence * coverage
+                if best is None or confidence > best["confidence"]:
+                    best = {
+                        "server": found["server"],
+                        "tool": rule.tool,
+                        "arguments": self._arguments(match.groupdict(), found["definition"]),
+                        "confidence": confidence,
+                        "rule": rule.name
+                    }
+        
+        if best is None:
+            self.fell_through += 1
+            return None
+        if best["confidence"] < self.threshold:
+            self.below_threshold += 1
+            logger.info(f"Intent {best['rule']} matched with confidence {best['confidence']:.2f} "
+                        f"below threshold {self.threshold}, using the LLM")
+            return None
+        
+        self.routed += 1
+        self.rule_hits[best["rule"]] += 1
+        logger.info(f"Routed directly to {best['server']}.{best['tool']} "
+                    f"(confidence {best['confidence']:.2f}): {best['arguments']}")
+        return best
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters for the debug command"""
+        total = self.routed + self.fell_through + self.below_threshold
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "routed": self.routed,
+            "below_threshold": self.below_threshold,
+            "fell_through": self.fell_through,
+            "hit_rate": self.routed / total if total else 0.0,
+            "rules": dict(self.rule_hits)
+        }
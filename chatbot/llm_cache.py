@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Request fields that change how a reply is delivered, not what it says
+TRANSPORT_FIELDS = ("stream", "keep_alive")
+
+class LLMResponseCache:
+    """On-disk cache of deterministic Ollama chat replies, one JSON file per request hash"""
+    
+    def __init__(self, path: str = "data/llm_cache", max_entries: int = 1000,
+                 max_bytes: int = 50 * 1024 * 1024, enabled: bool = False):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (last used, size in bytes); the file mtime is the last-used time across runs
+        self._index: Dict[str, Tuple[float, int]] = {}
+        if enabled:
+            self._load_index()
+    
+    @classmethod
+    def from_config(cls, config: Dict) -> "LLMResponseCache":
+        """Build a cache from the llm_cache block (disabled unless "enabled" is set)"""
+        cache_config = config.get("llm_cache", {})
+        return cls(
+            path=cache_config.get("path", "data/llm_cache"),
+            max_entries=cache_config.get("max_entries", 1000),
+            max_bytes=cache_config.get("max_bytes", 50 * 1024 * 1024),
+            enabled=cache_config.get("enabled", False)
+        )
+    
+    def _load_index(self):
+        """Index the entries left by earlier runs"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                self._index[entry.name[:-5]] = (stat.st_mtime, stat.st_size)
+        logger.info(f"LLM cache at {self.path}: {len(self._index)} entries")
+    
+    @staticmethod
+    def is_deterministic(payload: Dict[str, Any]) -> bool:
+        """Only temperature-0 requests reliably produce the same reply twice"""
+        return payload.get("options", {}).get("temperature") == 0
+    
+    def key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Hash of model, options and normalized messages, or None if the request may not be cached"""
+        if not self.enabled or not self.is_deterministic(payload):
+            return None
+        
+        request = {k: v for k, v in payload.items() if k not in TRANSPORT_FIELDS}
+        # Only role, content and tool calls affect the reply; whitespace at the ends of a message does not
+        request["messages"] = [
+            {"role": message.get("role"), "content": (message.get("content") or "").strip(),
+             "tool_calls": message.get("tool_calls") or []}
+            for message in payload.get("messages", [])
+        ]
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the cached reply message, or None on a miss"""
+        if key is None:
+            return None
+        
+        if key in self._index:
+            file_path = self.path / f"{key}.json"
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                now = time.time()
+                os.utime(file_path, (now, now))
+                self._index[key] = (now, self._index[key][1])
+                self.hits += 1
+                return entry["message"]
+            except (OSError, json.JSONDecodeError, KeyError) as e:
+                logger.warning(f"Dropping unreadable LLM cache entry {key}: {e}")
+                self._remove(key)
+        
+        self.misses += 1
+        return None
+    
+    def put(self, key: Optional[str], model: str, message: Dict[str, Any]):
+        """Store a reply message, then evict least recently used entries beyond the limits"""
+        if key is None:
+            return
+        
+        file_path = self.path / f"{key}.json"
+        data = json.dumps({"model": model, "created": time.time(), "message": message}, ensure_ascii=False)
+        try:
+            # Write to a temporary file first so a crash never leaves a truncated entry
+            tmp_path = file_path.with_suffix(".tmp")
+            tmp_path.write_text(data, encoding="utf-8")
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry: {e}")
+            return
+        
+        self._index[key] = (time.time(), len(data.encode()))
+        self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until both limits hold"""
+        total = sum(size for _, size in self._index.values())
+        if len(self._index) <= self.max_entries and total <= self.max_bytes:
+            return
+        
+        for key, (_, size) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if len(self._index) <= self.max_entries and total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            self.evictions += 1
+    
+    def _remove(self, key: str):
+        """Delete one entry from disk and the index"""
+        self._index.pop(key, None)
+        try:
+            (self.path / f"{key}.json").unlink()
+        except OSError:
+            pass
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the debug command"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._index),
+            "bytes": sum(size for _, size in self._index.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
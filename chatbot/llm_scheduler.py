@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first: a user waiting on a reply goes ahead of work nobody is waiting for
+DEFAULT_PRIORITIES = ["interactive", "background"]
+
+class LLMScheduler:
+    """Limits in-flight Ollama generations, granting free slots by priority and round-robin across sessions"""
+    
+    def __init__(self, max_in_flight: int = 4, priorities: Optional[List[str]] = None, backends: int = 1):
+        # max_in_flight is per backend; the limit grows and shrinks with the number of healthy backends
+        self.per_backend = max_in_flight
+        self.max_in_flight = max_in_flight * max(backends, 1)
+        self.priorities = priorities or list(DEFAULT_PRIORITIES)
+        self.in_flight = 0
+        # priority rank -> session -> waiters in arrival order; sessions take turns within a rank
+        self._queues: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            rank: OrderedDict() for rank in range(len(self.priorities))
+        }
+        self._waits: Dict[str, Dict[str, float]] = {
+            name: {"granted": 0, "total_wait": 0.0, "max_wait": 0.0} for name in self.priorities
+        }
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["LLMScheduler"]:
+        """Build a scheduler from the scheduler entry of the ollama block; None if max_in_flight is unset or 0"""
+        scheduler_config = config.get("scheduler", {})
+        if not scheduler_config.get("max_in_flight", 4):
+            return None
+        return cls(
+            max_in_flight=scheduler_config.get("max_in_flight", 4),
+            priorities=scheduler_config.get("priorities"),
+            backends=len(config.get("backends") or [None])
+        )
+    
+    def set_backends(self, count: int):
+        """Scale the limit to count healthy backends, granting any slots this frees up"""
+        self.max_in_flight = self.per_backend * max(count, 1)
+        while self.in_flight < self.max_in_flight and self._grant():
+            pass
+    
+    def _rank(self, priority: str) -> int:
+        """Queue rank of a priority class; unknown classes go last"""
+        return self.priorities.index(priority) if priority in self.priorities else len(self.priorities) - 1
+    
+    def queued(self) -> int:
+        """Number of requests waiting for a slot"""
+        return sum(len(waiters) for queue in self._queues.values() for waiters in queue.values())
+    
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive", session: Optional[str] = None) -> AsyncIterator[float]:
+        """Hold one generation slot for the duration of the block; yields the seconds spent waiting"""
+        started = time.perf_counter()
+        if self.in_flight < self.max_in_flight and not self.queued():
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            queue = self._queues[self._rank(priority)]
+            queue.setdefault(session or "", deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was granted just as the caller gave up, so pass it on
+                    self._release()
+                else:
+                    self._discard(queue, session or "", waiter)
+                raise
+        
+        waited = time.perf_counter() - started
+        stats = self._waits.setdefault(priority, {"granted": 0, "total_wait": 0.0, "max_wait": 0.0})
+        stats["granted"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+        if waited > 1.0:
+            logger.info(f"{priority} generation for session {session or '-'} waited {waited:.2f}s for a slot")
+        try:
+            yield waited
+        finally:
+            self._release()
+    
+    @staticmethod
+    def _discard(queue: "OrderedDict[str, Deque[asyncio.Future]]", session: str, waiter: asyncio.Future):
+        """Remove a cancelled waiter from its session's queue"""
+        waiters = queue.get(session)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del queue[session]
+    
+    def _release(self):
+        """Free a slot and hand it to the next waiter unless the limit was lowered meanwhile"""
+        self.in_flight -= 1
+        if self.in_flight < self.max_in_flight:
+            self._grant()
+    
+    def _grant(self) -> bool:
+        """Give a slot to the next waiter: highest priority first, then the next session in turn"""
+        for rank in sorted(self._queues):
+            queue = self._queues[rank]
+            while queue:
+                session, waiters = next(iter(queue.items()))
+                waiter = waiters.popleft()
+                # The session goes to the back of its class so others get a turn before its next request
+                del queue[session]
+                if waiters:
+                    queue[session] = waiters
+                if not waiter.done():
+                    self.in_flight += 1
+                    waiter.set_result(None)
+                    return True
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        """In-flight and queue counters with queue-wait times per priority class"""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_in_flight_per_backend": self.per_backend,
+            "in_flight": self.in_flight,
+            "queued": {name: sum(len(waiters) for waiters in self._queues[self._rank(name)].values())
+                       for name in self.priorities},
+            "waits": {
+                name: {
+                    "granted": int(stats["granted"]),
+                    "avg_wait": round(stats["total_wait"] / stats["granted"], 3) if stats["granted"] else 0.0,
+                    "max_wait": round(stats["max_wait"], 3)
+                }
+                for name, stats in self._waits.items()
+            }
+        }
@@ -1,8 +1,15 @@
 import asyncio
 import json
 import logging
+import time
+from collections import Counter
 from pathlib import Path
+from typing import Optional
 from ollama_client import OllamaClient
+from llm_cache import LLMResponseCache
+from intent_router import IntentRouter, is_multi_step
+from result_renderer import ResultRenderer
+from context_window import ContextWindow
 from mcp_host import MCPHost
 
 # Setup logging
@@ -20,39 +27,88 @@ logger = logging.getLogger(__name__)
 class MCPChatbot:
     """Main chatbot class that integrates Ollama with MCP servers"""
     
-    def __init__(self):
-        self.ollama = OllamaClient()
-        self.mcp_host = MCPHost()
-        self.conversation_history = []
+    def __init__(self, mcp_host: Optional[MCPHost] = None, ollama: Optional[OllamaClient] = None,
+                 session_id: str = "local"):
+        # Sessions of the chat server pass in one shared host and Ollama client; each keeps its own history
+        self.session_id = session_id
+        self.mcp_host = mcp_host or MCPHost()
+        self.ollama = ollama or OllamaClient.from_config(
+            self.mcp_host.config.get("ollama", {}),
+            cache=LLMResponseCache.from_config(self.mcp_host.config)
+        )
+        self.router = IntentRouter.from_config(self.mcp_host.config, self.mcp_host.get_available_tools)
+        self.renderer = ResultRenderer.from_config(self.mcp_host.config, self.mcp_host.get_available_tools)
+        # Summaries of evicted turns wait behind interactive generations in the LLM scheduler
+        self.context = ContextWindow.from_config(
+            self.mcp_host.config,
+            llm_chat=lambda messages: self.ollama.chat(messages, priority="background", session=self.session_id)
+        )
+        # The window's message list; evicted turns live on only in its rolling summary
+        self.conversation_history = self.context.messages
+        # Agent loop budgets: LLM steps that may call tools, and seconds per turn before answering with what it has
+        agent_config = self.mcp_host.config.get("agent", {})
+        self.agent_max_steps = agent_config.get("max_steps", 5)
+        self.agent_time_budget = agent_config.get("time_budget", 60.0)
+        # Tool calls of one turn that may run at the same time
+        self.max_parallel_tools = self.mcp_host.config.get("ollama", {}).get("max_parallel_tools", 4)
+        # "prompt": tools are described in the system prompt and called with JSON replies;
+        # "native": tool schemas go through Ollama's tools field and come back as tool_calls
+        self.tool_mode = self.mcp_host.config.get("ollama", {}).get("tool_mode", "prompt")
+        # Called with each reply token as it streams in, and with each progress notification
+        # of a running tool (both set by run_interactive)
+        self.on_token = None
+        self.on_progress = None
+        self.last_turn_metrics = {}
+        # The system prompt is kept byte-identical between turns so Ollama can reuse its cached prefix
+        self._system_prompt = None
+        self._system_prompt_tools = None
+        self._tool_specs = []
+        self._tool_names = {}
+        self._reply_streamed = False
     
     async def initialize(self):
         """Initialize the chatbot and MCP servers"""
         logger.info("Initializing MCP Chatbot...")
         
         # Check if Ollama is available
-        if not self.ollama.is_available():
+        if not await self.ollama.is_available():
             logger.error("Ollama is not available. Please ensure it's running with: ollama run llama3.2")
             return False
+        self.ollama.start_health_checks()
         
-        # Start MCP servers
+        # Start MCP servers (returns once every server has answered its handshake or timed out)
         await self.mcp_host.start_all_servers()
         
-        # Wait a moment for servers to fully initialize
-        await asyncio.sleep(1)
+        # Load the model and evaluate the system prompt now rather than on the first turn
+        if self.mcp_host.config.get("ollama", {}).get("warm_up", True):
+            system_message = {"role": "system", "content": self._get_system_prompt()}
+            if self.tool_mode == "native":
+                await self.ollama.warm_up([system_message], tools=self._tool_specs)
+            else:
+                await self.ollama.warm_up([system_message])
         
         logger.info("MCP Chatbot initialized successfully!")
         return True
     
-    async def _handle_tool_call(self, tool_call: dict) -> str:
-        """Handle tool call from LLM response"""
-        try:
-            server = tool_call.get("server", "").lower()
-            tool = tool_call.get("tool")
-            arguments = tool_call.get("arguments", {})
-            
+    async def _handle_tool_call(self, tool_call: dict, allow_llm: bool = True) -> tuple:
+        """Handle tool call from LLM response; returns (result for the LLM, templated reply or None)"""
+        return (await self._handle_tool_calls([tool_call], allow_llm=allow_llm))[0]
+    
+    async def _handle_tool_calls(self, tool_calls: list, allow_llm: bool = True) -> list:
+        """Run all tool calls of a turn, independent ones concurrently; returns one (result, reply) per call"""
+        calls = [(str(tool_call.get("server", "")).lower(), tool_call.get("tool"), tool_call.get("arguments") or {})
+                 for tool_call in tool_calls]
+        for server, tool, arguments in calls:
             logger.info(f"Calling tool {tool} on server {server} with args: {arguments}")
-            
-            result = await self.mcp_host.call_tool(server, tool, arguments)
+        
+        results = await self.mcp_host.call_many(calls, max_concurrency=self.max_parallel_tools,
+                                                on_progress=self.on_progress)
+        return [self._process_tool_result(server, tool, arguments, result, allow_llm)
+                for (server, tool, arguments), result in zip(calls, results)]
+    
+    def _process_tool_result(self, server: str, tool: str, arguments: dict, result: dict, allow_llm: bool) -> tuple:
+        """Turn a tool call's JSON-RPC response into the text for the LLM and a templated reply (or None)"""
+        try:
             logger.info(f"Raw tool result: {result}")
             
             if result and "result" in result:
@@ -62,22 +118,32 @@ class MCPChatbot:
                     # Handle MCP content format
                     if isinstance(content["content"], list) and len(content["content"]) > 0:
                         text_content = content["content"][0].get("text", str(content))
-                        return f"Tool executed successfully. Result: {text_content}"
                     else:
-                        return f"Tool executed successfully. Result: {content}"
+                        text_content = str(content)
                 else:
-                    return f"Tool executed successfully. Result: {json.dumps(content, indent=2)}"
+                    text_content = json.dumps(content, indent=2)
+                if isinstance(content, dict) and content.get("isError"):
+                    # The tool ran but failed; its message must not be templated like a result
+                    logger.error(f"Tool {tool} on {server} reported an error: {text_content}")
+                    reply = self.renderer.render_error(server, tool, text_content, allow_llm=allow_llm)
+                    return f"Tool call failed with error: {text_content}", reply
+                reply = self.renderer.render(server, tool, arguments, text_content, allow_llm=allow_llm)
+                return f"Tool executed successfully. Result: {text_content}", reply
             elif result and "error" in result:
                 error_msg = result["error"].get("message", "Unknown error")
                 logger.error(f"Tool call error: {error_msg}")
-                return f"Tool call failed with error: {error_msg}"
+                stderr = (result["error"].get("data") or {}).get("stderr")
+                if stderr:
+                    logger.error(f"Last stderr lines from {server}:\n" + "\n".join(stderr))
+                reply = self.renderer.render_error(server, tool, error_msg, allow_llm=allow_llm)
+                return f"Tool call failed with error: {error_msg}", reply
             else:
                 logger.warning(f"Unexpected tool result format: {result}")
-                return f"Tool call completed but returned unexpected result: {result}"
+                return f"Tool call completed but returned unexpected result: {result}", None
                 
         except Exception as e:
             logger.error(f"Error handling tool call: {e}")
-            return f"Error executing tool: {e}"
+            return f"Error executing tool: {e}", None
 
     def _create_system_prompt(self) -> str:
         """Create system prompt with available tools"""
@@ -107,67 +173,338 @@ class MCPChatbot:
         "arguments": {...}
     }
 
+    When a request needs several tools, return all the calls at once in this format (they run in parallel):
+    {
+        "action": "use_tools",
+        "calls": [
+            {"server": "server_name", "tool": "exact_tool_name_from_above", "arguments": {...}},
+            {"server": "server_name", "tool": "exact_tool_name_from_above", "arguments": {...}}
+        ]
+    }
+
     CRITICAL RULES:
-    - ALWAYS use "use_tool" as the action value
+    - ALWAYS use "use_tool" as the action value for one call and "use_tools" for several
     - Use EXACT server names: research, file, calculator
     - Use EXACT tool names as listed above
     - For research papers, use parameter "topic"
     - For math operations, use parameters like "a", "b", "base", "exponent", etc.
     - For file operations, use "directory", "filename", "content" as needed
     - NEVER provide explanatory text with the JSON - ONLY return the JSON object
+    - You will see the tool results and may then call more tools, e.g. search_papers, then extract_info on a returned ID, then write_file with a summary
+    - If you already know you will need another tool after this one, add "more_steps": true to the JSON
 
     Examples:
     - For "list files": {"action": "use_tool", "server": "file", "tool": "list_files", "arguments": {}}
     - For "multiply 3 and 4": {"action": "use_tool", "server": "calculator", "tool": "multiply", "arguments": {"a": 3, "b": 4}}
     - For "search papers on AI": {"action": "use_tool", "server": "research", "tool": "search_papers", "arguments": {"topic": "AI"}}
+    - For "search papers on AI and compute 2^10": {"action": "use_tools", "calls": [{"server": "research", "tool": "search_papers", "arguments": {"topic": "AI"}}, {"server": "calculator", "tool": "power", "arguments": {"base": 2, "exponent": 10}}]}
 
     Otherwise, respond normally to the user's query.
     """
         return prompt
 
     
+    def _create_native_system_prompt(self) -> str:
+        """Short system prompt for native tool calling; the tool schemas travel in the tools field"""
+        servers = ", ".join(
+            f"{name} ({server.description})" if server.description else name
+            for name, server in self.mcp_host.servers.items()
+        )
+        return (f"You are an AI assistant with access to tools from these MCP servers: {servers}. "
+                "Call a tool when the user's request needs one; otherwise answer directly. "
+                "You see each tool's result and may call further tools with it, e.g. to look up a search result. "
+                "When you call a tool as one step of a longer plan, say so briefly alongside the call.")
+    
+    def _create_tool_specs(self) -> tuple:
+        """Ollama tool definitions built from each tool's inputSchema, and a name -> (server, tool) map"""
+        tools = self.mcp_host.get_available_tools()
+        counts = Counter(tool.get("name") for server_tools in tools.values() for tool in server_tools)
+        specs, names = [], {}
+        for server_name, server_tools in tools.items():
+            for tool in server_tools:
+                # Tool names are used as they are unless two servers share one
+                name = tool["name"] if counts[tool["name"]] == 1 else f"{server_name}__{tool['name']}"
+                names[name] = (server_name, tool["name"])
+                specs.append({
+                    "type": "function",
+                    "function": {
+                        "name": name,
+                        "description": tool.get("description", ""),
+                        "parameters": tool.get("inputSchema", {"type": "object", "properties": {}})
+                    }
+                })
+        return specs, names
+    
+    def _get_system_prompt(self) -> str:
+        """Return the system prompt, rebuilding it only when the tool catalogue changed"""
+        tools = json.dumps(self.mcp_host.get_available_tools(), sort_keys=True)
+        if tools != self._system_prompt_tools:
+            if self._system_prompt_tools is not None:
+                logger.info("Tool catalogue changed, rebuilding system prompt")
+            if self.tool_mode == "native":
+                self._system_prompt = self._create_native_system_prompt()
+                self._tool_specs, self._tool_names = self._create_tool_specs()
+            else:
+                self._system_prompt = self._create_system_prompt()
+            self._system_prompt_tools = tools
+        return self._system_prompt
+    
+    async def _stream_chat(self, messages: list, metrics: dict, **kwargs) -> tuple:
+        """Stream a reply, passing tokens to on_token unless it is tool-call JSON; returns (text, tool calls)"""
+        parts = []
+        tool_calls = []
+        streaming = None  # undecided until the first non-whitespace character arrives
+        async for chunk in self.ollama.chat_stream(messages, priority="interactive", session=self.session_id,
+                                                   **kwargs):
+            tool_calls.extend(chunk.get("message", {}).get("tool_calls") or [])
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                if metrics["first_token"] is None:
+                    metrics["first_token"] = time.perf_counter() - metrics["started"]
+                parts.append(token)
+                if streaming is None and "".join(parts).strip():
+                    # A reply that opens with "{" or "[" may be a tool call, so it is held back
+                    streaming = not "".join(parts).lstrip().startswith(("{", "["))
+                    token = "".join(parts)
+                    if streaming and metrics["streamed"]:
+                        # A later agent step continues on a new line after the text already shown
+                        token = "\n" + token.lstrip()
+                if streaming and self.on_token:
+                    self.on_token(token)
+                    metrics["streamed"] = True
+            
+            if chunk.get("done"):
+                metrics["cached"] = metrics["cached"] or chunk.get("cached", False)
+                metrics["eval_count"] += chunk.get("eval_count", 0)
+                metrics["eval_duration"] += chunk.get("eval_duration", 0)
+                metrics["queue_wait"] += chunk.get("queue_wait", 0.0)
+        
+        return "".join(parts), tool_calls
+    
+    def _finish_turn(self, metrics: dict):
+        """Record time-to-first-token and generation speed of the last turn"""
+        eval_seconds = metrics["eval_duration"] / 1e9
+        self.last_turn_metrics = {
+            "ttft": metrics["first_token"],
+            "total": time.perf_counter() - metrics["started"],
+            "tokens": metrics["eval_count"],
+            "tokens_per_second": metrics["eval_count"] / eval_seconds if eval_seconds else None,
+            "cached": metrics["cached"],
+            "routed": metrics["routed"],
+            "rendered": metrics["rendered"],
+            "prompt_tokens": metrics["prompt_tokens"],
+            "steps": metrics["steps"],
+            "queue_wait": metrics["queue_wait"]
+        }
+        logger.info(f"Turn metrics: {self.last_turn_metrics}")
+    
     async def chat(self, user_input: str) -> str:
         """Process user input and generate response"""
+        metrics = {"started": time.perf_counter(), "first_token": None, "eval_count": 0, "eval_duration": 0,
+                   "cached": False, "routed": None, "rendered": False, "prompt_tokens": None, "steps": [],
+                   "streamed": False, "queue_wait": 0.0}
         try:
             # Add user message to history
             self.conversation_history.append({"role": "user", "content": user_input})
             
-            # Create messages for Ollama
-            messages = [
-                {"role": "system", "content": self._create_system_prompt()}
-            ] + self.conversation_history[-10:]  # Keep last 10 messages
+            # Trivial requests go straight to their tool without any LLM generation
+            route = self.router.route(user_input)
+            if route:
+                return await self._answer_routed(route, metrics)
             
-            # Get response from Ollama
-            response = self.ollama.chat(messages)
+            # Create messages for Ollama: system prompt, summary of evicted turns, then history within the token budget
+            messages = await self.context.build(self._get_system_prompt())
+            metrics["prompt_tokens"] = sum(self.context.count(message) for message in messages)
             
-            # Check if response contains a tool call
-            try:
-                if response.strip().startswith('{') and '"action": "use_tool"' in response:
-                    tool_call = json.loads(response.strip())
-                    tool_result = await self._handle_tool_call(tool_call)
-                    
-                    # Get final response from Ollama with tool result
-                    messages.append({"role": "assistant", "content": response})
-                    messages.append({"role": "user", "content": f"Tool result: {tool_result}. Please provide a natural language response to the user based on this result."})
-                    
-                    final_response = self.ollama.chat(messages)
-                    self.conversation_history.append({"role": "assistant", "content": final_response})
-                    return final_response
-                else:
-                    self.conversation_history.append({"role": "assistant", "content": response})
-                    return response
-                    
-            except json.JSONDecodeError:
-                # Not a tool call, return response as is
-                self.conversation_history.append({"role": "assistant", "content": response})
-                return response
+            # Let the model chain tool calls until it answers
+            response = await self._run_agent(messages, metrics, is_multi_step(user_input))
+            self.conversation_history.append({"role": "assistant", "content": response})
+            return response
                 
         except Exception as e:
             logger.error(f"Error in chat: {e}")
             return f"Sorry, I encountered an error: {e}"
+        finally:
+            self._finish_turn(metrics)
+            self.context.schedule_compaction()
+    
+    @staticmethod
+    def _parse_tool_calls(response: str) -> list:
+        """Tool calls in a prompt-mode reply: one use_tool object, a use_tools object or a list of use_tool objects"""
+        text = response.strip()
+        if not text.startswith(("{", "[")) or '"use_tool' not in text:
+            return []
+        
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            calls = parsed.get("calls", []) if parsed.get("action") == "use_tools" else [parsed]
+        else:
+            calls = parsed
+        if not isinstance(calls, list):
+            return []
+        return [call for call in calls if isinstance(call, dict) and call.get("tool")]
+    
+    async def _answer_routed(self, route: dict, metrics: dict) -> str:
+        """Answer a request the intent router matched, straight from the tool result"""
+        metrics["routed"] = f"{route['server']}.{route['tool']}"
+        tool_result, response = await self._handle_tool_call(route, allow_llm=False)
+        if response is None:
+            response = tool_result
+        
+        self.conversation_history.append({"role": "assistant", "content": response})
+        return response
+    
+    def _resolve_tool_call(self, call: dict) -> dict:
+        """Turn an Ollama tool call into the server/tool/arguments form _handle_tool_call takes"""
+        function = call.get("function", {})
+        arguments = function.get("arguments") or {}
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments)
+        server, tool = self._tool_names.get(function.get("name"), ("", function.get("name")))
+        return {"server": server, "tool": tool, "arguments": arguments}
+    
+    def _tool_step(self, response: str, native_calls: list) -> tuple:
+        """Tool calls the model asked for and whether it announced further steps after them"""
+        if self.tool_mode == "native":
+            # Text next to native tool calls means the model is working through a plan rather than done
+            return [self._resolve_tool_call(call) for call in native_calls], bool(response.strip())
+        try:
+            return self._parse_tool_calls(response), '"more_steps": true' in response
+        except json.JSONDecodeError:
+            # Not a tool call, the response is the answer
+            return [], False
+    
+    def _add_tool_results(self, messages: list, response: str, native_calls: list, tool_calls: list,
+                          outcomes: list, final: bool):
+        """Feed a step's tool results back to the model in one message (prompt mode) or one per call (native)"""
+        if self.tool_mode == "native":
+            messages.append({"role": "assistant", "content": response, "tool_calls": native_calls})
+            for tool_result, _ in outcomes:
+                messages.append({"role": "tool", "content": tool_result})
+            return
+        
+        messages.append({"role": "assistant", "content": response})
+        if final:
+            instruction = "Please provide a natural language response to the user based on"
+        else:
+            instruction = ("If the request needs another tool, reply with the next tool call JSON; otherwise "
+                           "provide a natural language response to the user based on")
+        if len(outcomes) == 1:
+            messages.append({"role": "user", "content": f"Tool result: {outcomes[0][0]}. {instruction} this result."})
+        else:
+            results = "\n".join(f"{index}. {call.get('server')}.{call.get('tool')}: {tool_result}"
+                                for index, (call, (tool_result, _)) in enumerate(zip(tool_calls, outcomes), 1))
+            messages.append({"role": "user", "content": f"Tool results:\n{results}\n{instruction} these results."})
+    
+    async def _run_agent(self, messages: list, metrics: dict, multi_step: bool = False) -> str:
+        """Agent loop: the model calls tools, sees their results and may call more, within step and time budgets"""
+        kwargs = {"tools": self._tool_specs} if self.tool_mode == "native" else {}
+        deadline = metrics["started"] + self.agent_time_budget
+        steps = metrics["steps"]
+        previous_calls = None
+        stop_reason = None
+        
+        for step in range(1, self.agent_max_steps + 1):
+            step_started = time.perf_counter()
+            response, native_calls = await self._stream_chat(messages, metrics, **kwargs)
+            llm_seconds = time.perf_counter() - step_started
+            tool_calls, more_steps = self._tool_step(response, native_calls)
+            
+            if not tool_calls:
+                steps.append({"step": step, "llm": llm_seconds, "tools": 0.0, "calls": []})
+                return response
+            
+            # Early exit: a model that repeats the calls it just made is not getting any further
+            calls_key = json.dumps(tool_calls, sort_keys=True)
+            if calls_key == previous_calls:
+                steps.append({"step": step, "llm": llm_seconds, "tools": 0.0, "calls": []})
+                stop_reason = "the model repeated its last tool calls"
+                messages.append({"role": "assistant", "content": response})
+                messages.append({"role": "user", "content": "Do not call the tools again. Please provide a natural "
+                                                            "language response to the user based on the results above."})
+                break
+            previous_calls = calls_key
+            
+            tools_started = time.perf_counter()
+            outcomes = await self._handle_tool_calls(tool_calls)
+            steps.append({"step": step, "llm": llm_seconds, "tools": time.perf_counter() - tools_started,
+                          "calls": [f"{call.get('server')}.{call.get('tool')}" for call in tool_calls]})
+            
+            replies = [reply for _, reply in outcomes]
+            single_step = step == 1 and len(tool_calls) == 1 and not multi_step and not more_steps
+            if single_step and all(reply is not None for reply in replies):
+                # A one-call request whose result has a template needs no follow-up LLM round trip;
+                # otherwise the model sees the results, as it may still need to act on them
+                metrics["rendered"] = True
+                reply = "\n".join(replies)
+                if metrics["streamed"] and self.on_token:
+                    # Text from earlier steps is already on screen, so the reply has to follow it there
+                    self.on_token("\n" + reply)
+                return reply
+            
+            if step == self.agent_max_steps:
+                stop_reason = f"the limit of {self.agent_max_steps} tool steps was reached"
+            elif time.perf_counter() >= deadline:
+                stop_reason = f"the {self.agent_time_budget:.0f}s time budget ran out"
+            self._add_tool_results(messages, response, native_calls, tool_calls, outcomes, final=stop_reason is not None)
+            if stop_reason:
+                break
+        
+        # Out of budget: one last call without tools for an answer from the results so far
+        logger.warning(f"Agent loop stopped after {len(steps)} step(s): {stop_reason}")
+        step_started = time.perf_counter()
+        response, _ = await self._stream_chat(messages, metrics)
+        steps.append({"step": len(steps) + 1, "llm": time.perf_counter() - step_started, "tools": 0.0, "calls": []})
+        if self.tool_mode != "native":
+            try:
+                if self._parse_tool_calls(response):
+                    return f"I stopped before finishing because {stop_reason}."
+            except json.JSONDecodeError:
+                pass
+        return response
+    
+    @staticmethod
+    def _show_progress(progress: dict):
+        """Print a progress notification from a running tool, e.g. paper IDs as they are found"""
+        total = f"/{progress['total']}" if progress.get("total") else ""
+        print(f"  ⏳ [{progress.get('progress')}{total}] {progress.get('message', '')}")
+    
+    def _print_token(self, token: str):
+        """Print a streamed reply token as soon as it arrives"""
+        if not self._reply_streamed:
+            print("Bot: ", end="")
+            self._reply_streamed = True
+        print(token, end="", flush=True)
+    
+    def _show_turn_metrics(self):
+        """Print time-to-first-token and tokens per second of the last turn"""
+        metrics = self.last_turn_metrics
+        if metrics.get("routed"):
+            print(f"⚡ answered by {metrics['routed']} without the LLM in {metrics['total'] * 1000:.1f} ms\n")
+            return
+        if metrics.get("ttft") is None:
+            return
+        if metrics["cached"]:
+            speed = "served from LLM cache"
+        elif metrics["tokens_per_second"]:
+            speed = f"{metrics['tokens_per_second']:.1f} tokens/s"
+        else:
+            speed = "speed n/a"
+        prompt = f", ~{metrics['prompt_tokens']} prompt tokens" if metrics.get("prompt_tokens") else ""
+        if metrics.get("queue_wait", 0.0) >= 0.01:
+            prompt += f", {metrics['queue_wait']:.2f}s queued for the model"
+        rendered = ", result templated" if metrics.get("rendered") else ""
+        print(f"⏱️  first token {metrics['ttft']:.2f}s, {speed}, {metrics['total']:.2f}s total{prompt}{rendered}")
+        if len(metrics.get("steps", [])) > 1:
+            for step in metrics["steps"]:
+                calls = f", tools {step['tools']:.2f}s ({', '.join(step['calls'])})" if step["calls"] else ""
+                print(f"   step {step['step']}: LLM {step['llm']:.2f}s{calls}")
+        print()
     
     async def run_interactive(self):
         """Run interactive chat loop"""
+        self.on_token = self._print_token
+        self.on_progress = self._show_progress
         print("🤖 MCP Chatbot is ready! Type 'quit' to exit.")
         print("Available commands:")
         print("- 'tools' - Show available tools")
@@ -177,7 +514,8 @@ class MCPChatbot:
         
         while True:
             try:
-                user_input = input("You: ").strip()
+                # Read stdin off the event loop so idle shutdowns, health checks and compaction keep running
+                user_input = (await asyncio.to_thread(input, "You: ")).strip()
                 
                 if user_input.lower() in ['quit', 'exit']:
                     break
@@ -197,21 +535,68 @@ class MCPChatbot:
                     print(f"\n🔍 Debug Info:")
                     print(f"Available servers: {list(self.mcp_host.servers.keys())}")
                     for name, server in self.mcp_host.servers.items():
-                        status = "initialized" if server.initialized else "not initialized"
-                        print(f"Server '{name}': {status}, {len(server.available_tools)} tools")
+                        if server.lazy and not server.workers:
+                            status = "idle (starts on first call)"
+                        else:
+                            status = "initialized" if server.initialized else "not initialized"
+                        startup = f", ready in {server.startup_time * 1000:.0f} ms" if server.startup_time is not None else ""
+                        print(f"Server '{name}': {status}, {len(server.available_tools)} tools, "
+                              f"{len(server.workers)} worker(s), {server.in_flight} in flight{startup}")
+                        print(f"  health: circuit {server.breaker.state}, {server.restart_count} restart(s), "
+                              f"{server.downtime:.1f}s downtime")
+                    cache_stats = self.mcp_host.tool_cache.stats()
+                    print(f"Tool cache: {cache_stats['entries']} entries, {cache_stats['hits']} hits, "
+                          f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate), "
+                          f"{cache_stats['invalidations']} invalidated")
+                    router_stats = self.router.stats()
+                    if router_stats["enabled"]:
+                        print(f"Intent router: {router_stats['routed']} routed, "
+                              f"{router_stats['below_threshold']} below threshold {router_stats['threshold']}, "
+                              f"{router_stats['fell_through']} to the LLM ({router_stats['hit_rate']:.0%} hit rate)")
+                    context_stats = self.context.stats()
+                    print(f"Context: {context_stats['messages']} messages, ~{context_stats['tokens']}/"
+                          f"{context_stats['budget_tokens']} tokens (summary ~{context_stats['summary_tokens']}), "
+                          f"{context_stats['evicted']} evicted, {context_stats['truncated']} truncated")
+                    if len(self.ollama.backends) > 1:
+                        for backend in self.ollama.stats():
+                            print(f"Ollama backend {backend['base_url']} ({backend['model']}, weight {backend['weight']}): "
+                                  f"{'up' if backend['healthy'] else 'down'}, {backend['outstanding']} outstanding, "
+                                  f"{backend['requests']} requests, {backend['failures']} failures")
+                    if self.ollama.scheduler is not None:
+                        scheduler_stats = self.ollama.scheduler.stats()
+                        waits = ", ".join(f"{name} {wait['granted']} (avg {wait['avg_wait']:.2f}s, max {wait['max_wait']:.2f}s)"
+                                          for name, wait in scheduler_stats["waits"].items())
+                        print(f"LLM scheduler: {scheduler_stats['in_flight']}/{scheduler_stats['max_in_flight']} in flight, "
+                              f"{sum(scheduler_stats['queued'].values())} queued; waits: {waits}")
+                    render_stats = self.renderer.stats()
+                    if render_stats["enabled"]:
+                        print(f"Result rendering: {render_stats['rendered']} templated, "
+                              f"{render_stats['summarized']} summarized by the LLM "
+                              f"({render_stats['rendered_rate']:.0%} without a second LLM call)")
+                    llm_stats = self.ollama.cache.stats()
+                    if llm_stats["enabled"]:
+                        print(f"LLM cache: {llm_stats['entries']} entries ({llm_stats['bytes'] / 1024:.0f} KiB), "
+                              f"{llm_stats['hits']} hits, {llm_stats['misses']} misses "
+                              f"({llm_stats['hit_rate']:.0%} hit rate), {llm_stats['evictions']} evicted")
                     print()
                     continue
                 elif user_input.lower() == 'clear':
-                    self.conversation_history.clear()
+                    self.context.clear()
                     print("🧹 Conversation history cleared!")
                     continue
                 elif not user_input:
                     continue
                 
+                self._reply_streamed = False
                 response = await self.chat(user_input)
-                print(f"Bot: {response}\n")
+                if self._reply_streamed:
+                    print("\n")
+                else:
+                    # Held-back replies (JSON that turned out not to be a tool call) and errors
+                    print(f"Bot: {response}\n")
+                self._show_turn_metrics()
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 break
             except Exception as e:
                 logger.error(f"Error in interactive loop: {e}")
@@ -219,7 +604,9 @@ class MCPChatbot:
     
     async def cleanup(self):
         """Cleanup resources"""
-        self.mcp_host.stop_all_servers()
+        await self.context.wait()
+        await self.mcp_host.stop_all_servers()
+        await self.ollama.close()
         logger.info("Chatbot cleanup completed")
 
 async def main():
@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import re
+import signal
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from mcp_host import MCPHost, DEFAULT_SOCKET_DIR, STREAM_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Request id near the start of an oversized message, so its caller gets an error rather than a timeout
+REQUEST_ID_PATTERN = re.compile(rb'"id"\s*:\s*(-?\d+|"[^"]*")')
+
+class ClientStats:
+    """Request accounting for one client connection"""
+    
+    def __init__(self, client_id: int, server: str, peer: str):
+        self.client_id = client_id
+        self.server = server
+        self.peer = peer
+        self.client_name = "unknown"
+        self.connected_at = time.time()
+        self.requests = 0
+        self.tool_calls = 0
+        self.errors = 0
+        self.busy_time = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary reported by the daemon/stats method"""
+        return {
+            "client_id": self.client_id,
+            "client": self.client_name,
+            "server": self.server,
+            "peer": self.peer,
+            "connected_for": round(time.time() - self.connected_at, 1),
+            "requests": self.requests,
+            "tool_calls": self.tool_calls,
+            "errors": self.errors,
+            "busy_time": round(self.busy_time, 3)
+        }
+
+class MCPDaemon:
+    """Serves the servers of one shared MCPHost to many clients over Unix or TCP sockets"""
+    
+    def __init__(self, host: MCPHost):
+        daemon_config = host.config.get("daemon", {})
+        self.host = host
+        self.socket_dir = Path(daemon_config.get("socket_dir", DEFAULT_SOCKET_DIR))
+        self.tcp_host = daemon_config.get("tcp_host", "127.0.0.1")
+        self.tcp_base_port = daemon_config.get("tcp_base_port")
+        self.listeners: List[asyncio.AbstractServer] = []
+        self.clients: Dict[int, ClientStats] = {}
+        self._client_ids = itertools.count(1)
+    
+    async def start(self):
+        """Open one listening socket per MCP server"""
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        
+        for index, name in enumerate(self.host.servers):
+            def handler(reader, writer, name=name):
+                return self._serve_client(name, reader, writer)
+            
+            socket_path = self.socket_dir / f"{name}.sock"
+            socket_path.unlink(missing_ok=True)
+            self.listeners.append(await asyncio.start_unix_server(handler, path=str(socket_path), limit=STREAM_LIMIT))
+            addresses = [f"unix://{socket_path}"]
+            
+            if self.tcp_base_port:
+                port = self.tcp_base_port + index
+                self.listeners.append(await asyncio.start_server(handler, self.tcp_host, port, limit=STREAM_LIMIT))
+                addresses.append(f"tcp://{self.tcp_host}:{port}")
+            
+            logger.info(f"Serving MCP server {name} on {', '.join(addresses)}")
+    
+    async def stop(self):
+        """Close all listening sockets"""
+        for listener in self.listeners:
+            listener.close()
+            await listener.wait_closed()
+        self.listeners.clear()
+        
+        for socket_path in self.socket_dir.glob("*.sock"):
+            socket_path.unlink(missing_ok=True)
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-client request accounting for all connected clients"""
+        return [client.to_dict() for client in self.clients.values()]
+    
+    async def _serve_client(self, server_name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read JSON-RPC lines from one client, answering requests concurrently"""
+        client = ClientStats(next(self._client_ids), server_name, str(writer.get_extra_info("peername") or "unix"))
+        self.clients[client.client_id] = client
+        logger.info(f"Client {client.client_id} connected to {server_name}")
+        tasks = set()
+        requests: Dict[Any, asyncio.Task] = {}
+        
+        try:
+            while True:
+                line = await self._read_line(reader)
+                if not line:
+                    break
+                
+                if isinstance(line, tuple):
+                    _, request_id = line
+                    await self._send(writer, self._error(request_id, -32600,
+                                                         f"Invalid Request: message exceeds {STREAM_LIMIT} bytes"))
+                    continue
+                
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    await self._send(writer, self._error(None, -32700, "Parse error"))
+                    continue
+                
+                if isinstance(message, dict) and message.get("method") == "notifications/cancelled":
+                    self._cancel(client, requests, message.get("params", {}))
+                    continue
+                
+                # Pipelined requests from one client run concurrently
+                task = asyncio.create_task(self._handle_line(client, message, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if isinstance(message, dict) and "id" in message:
+                    request_id = message["id"]
+                    requests[request_id] = task
+                    task.add_done_callback(lambda _, request_id=request_id: requests.pop(request_id, None))
+        
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            del self.clients[client.client_id]
+            writer.close()
+            logger.info(f"Client {client.client_id} ({client.client_name}) disconnected from {server_name}: "
+                        f"{client.requests} requests, {client.tool_calls} tool calls, {client.errors} errors")
+    
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader):
+        """Read one message line; a line over STREAM_LIMIT is skipped and returned as ("oversized", request id)"""
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        
+        head = await reader.readexactly(consumed)
+        match = REQUEST_ID_PATTERN.search(head[:1024])
+        request_id = json.loads(match.group(1)) if match else None
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                return "oversized", request_id
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+    
+    @staticmethod
+    def _cancel(client: ClientStats, requests: Dict[Any, asyncio.Task], params: Dict):
+        """Abandon a client's in-flight request; the pool passes the cancellation on to the worker"""
+        task = requests.pop(params.get("requestId"), None)
+        if task is not None:
+            logger.info(f"Client {client.client_id} cancelled request {params.get('requestId')}: "
+                        f"{params.get('reason', 'no reason given')}")
+            task.cancel()
+    
+    async def _handle_line(self, client: ClientStats, message: Any, writer: asyncio.StreamWriter):
+        """Answer a single message or batch"""
+        started = time.perf_counter()
+        try:
+            if isinstance(message, list):
+                response = await self._handle_batch(client, message)
+            else:
+                response = await self._handle_message(client, message, writer)
+            
+            if response is not None:
+                await self._send(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            client.busy_time += time.perf_counter() - started
+    
+    async def _handle_batch(self, client: ClientStats, messages: List[Any]) -> Optional[Any]:
+        """Answer a batch, forwarding its tool calls to the pool as one batch"""
+        if not messages:
+            return self._error(None, -32600, "Invalid Request: empty batch")
+        
+        calls = [m for m in messages if isinstance(m, dict) and m.get("method") == "tools/call" and "id" in m]
+        call_ids = {id(call) for call in calls}
+        others = [m for m in messages if id(m) not in call_ids]
+        
+        responses = []
+        if calls:
+            client.requests += len(calls)
+            client.tool_calls += len(calls)
+            results = await self.host.call_tools(client.server, [
+                (call.get("params", {}).get("name"), call.get("params", {}).get("arguments", {}))
+                for call in calls
+            ])
+            for call, result in zip(calls, results):
+                responses.append(self._tool_response(client, call.get("id"), result))
+        
+        for message in others:
+            response = await self._handle_message(client, message) if isinstance(message, dict) \
+                else self._error(None, -32600, "Invalid Request")
+            if response is not None:
+                responses.append(response)
+        
+        return responses or None
+    
+    async def _handle_message(self, client: ClientStats, message: Dict,
+                              writer: Optional[asyncio.StreamWriter] = None) -> Optional[Dict]:
+        """Answer one JSON-RPC message on behalf of the shared pool"""
+        method = message.get("method")
+        if "id" not in message:
+            return None
+        
+        request_id = message.get("id")
+        params = message.get("params", {})
+        pool = self.host.servers[client.server]
+        client.requests += 1
+        
+        if method == "initialize":
+            client.client_name = params.get("clientInfo", {}).get("name", "unknown")
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "protocolVersion": "2024-11-05",
+                    "capabilities": {"tools": {}},
+                    "serverInfo": {"name": f"{client.server}-server (shared)", "version": "1.0.0"}
+                }
+            }
+        elif method == "ping":
+            return {"jsonrpc": "2.0", "id": request_id, "result": {}}
+        elif method == "tools/list":
+            return {"jsonrpc": "2.0", "id": request_id, "result": {"tools": pool.available_tools}}
+        elif method == "tools/call":
+            client.tool_calls += 1
+            on_progress = None
+            progress_token = params.get("_meta", {}).get("progressToken")
+            if progress_token is not None and writer is not None:
+                on_progress = lambda progress: self._relay_progress(writer, progress_token, progress)
+            result = await self.host.call_tool(client.server, params.get("name"), params.get("arguments", {}),
+                                               on_progress=on_progress)
+            return self._tool_response(client, request_id, result)
+        elif method == "daemon/stats":
+            return {"jsonrpc": "2.0", "id": request_id, "result": {"clients": self.stats()}}
+        
+        client.errors += 1
+        return self._error(request_id, -32601, f"Unknown method: {method}")
+    
+    def _tool_response(self, client: ClientStats, request_id: Any, result: Optional[Dict]) -> Dict:
+        """Re-address a pool response to the client's request id"""
+        if result is None:
+            client.errors += 1
+            return self._error(request_id, -32603, f"Server {client.server} is unavailable")
+        
+        if "error" in result:
+            client.errors += 1
+        response = dict(result)
+        response["id"] = request_id
+        return response
+    
+    @staticmethod
+    def _relay_progress(writer: asyncio.StreamWriter, progress_token: Any, progress: Dict):
+        """Forward a worker's progress notification under the client's own progress token"""
+        if writer.is_closing():
+            return
+        params = dict(progress, progressToken=progress_token)
+        writer.write((json.dumps({"jsonrpc": "2.0", "method": "notifications/progress", "params": params}) + "\n").encode())
+    
+    @staticmethod
+    def _error(request_id: Any, code: int, message: str) -> Dict:
+        """Build a JSON-RPC error response"""
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+    
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, message: Any):
+        """Write one JSON-RPC message line to a client"""
+        writer.write((json.dumps(message) + "\n").encode())
+        await writer.drain()
+
+async def main():
+    """Run the shared MCP server daemon until interrupted"""
+    parser = argparse.ArgumentParser(description="Shared MCP server daemon")
+    parser.add_argument("--config", default="config/mcp_config.json", help="Path to mcp_config.json")
+    options = parser.parse_args()
+    
+    host = MCPHost(options.config)
+    # Servers that chatbots reach through the daemon are run here as ordinary subprocesses
+    for server_config in host.config.get("mcp_servers", {}).values():
+        if server_config.get("transport") == "socket":
+            server_config["transport"] = server_config.get("daemon_transport", "stdio")
+    
+    await host.start_all_servers()
+    daemon = MCPDaemon(host)
+    await daemon.start()
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    try:
+        await stop_event.wait()
+    finally:
+        await daemon.stop()
+        await host.stop_all_servers()
+        logger.info("MCP daemon stopped")
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
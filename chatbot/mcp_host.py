@@ -1,192 +1,1135 @@
 import asyncio
+import concurrent.futures
+import importlib.util
+import itertools
 import json
-import subprocess
 import logging
-from typing import Dict, List, Any, Optional
+from collections import deque
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
 import time
 
+from supervisor import CircuitBreaker, MCPSupervisor
+from tool_cache import ToolResultCache
+
 logger = logging.getLogger(__name__)
 
+# Receives the params of each notifications/progress message for a tool call
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Upper bound for a single JSON-RPC line read from a server (e.g. large read_file results)
+STREAM_LIMIT = 16 * 1024 * 1024
+
+# Lines of each server's stderr kept in memory and attached to failed calls
+DEFAULT_STDERR_LINES = 50
+
+# JSON-RPC error code for calls that got no response because the server failed
+SERVER_FAILURE_CODE = -32001
+
+# JSON-RPC error code for calls abandoned because their deadline expired
+CALL_TIMEOUT_CODE = -32002
+
+# Deadline for a tool call unless the server config sets "timeout" or "tool_timeouts"
+DEFAULT_CALL_TIMEOUT = 60.0
+
+# Seconds a server may take from spawn to answering initialize and tools/list
+DEFAULT_STARTUP_TIMEOUT = 10.0
+
+def is_server_failure(response: Optional[Dict]) -> bool:
+    """Whether a tool call failed because of the server rather than the tool"""
+    return response is None or response.get("error", {}).get("code") in (SERVER_FAILURE_CODE, CALL_TIMEOUT_CODE)
+
+def timeout_response(server_name: str, method: str, timeout: float) -> Dict:
+    """Error response for a request whose deadline expired"""
+    return {
+        "jsonrpc": "2.0",
+        "id": None,
+        "error": {
+            "code": CALL_TIMEOUT_CODE,
+            "message": f"{method} on {server_name} timed out after {timeout:.2f}s"
+        }
+    }
+
+# Pool autoscaling defaults (overridable per server in mcp_config.json)
+DEFAULT_SCALE_UP_QUEUE_DEPTH = 1
+DEFAULT_SCALE_DOWN_IDLE = 30.0
+SCALE_CHECK_INTERVAL = 1.0
+
+# Lazy servers are stopped after this many idle seconds unless configured otherwise
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_TOOL_CATALOGUE_CACHE = "data/tool_catalogue.json"
+
+# Where the shared MCP daemon (mcp_daemon.py) puts its Unix sockets
+DEFAULT_SOCKET_DIR = "run"
+
 class MCPServer:
     """Represents an MCP Server instance"""
     
-    def __init__(self, name: str, command: str, args: List[str], description: str = ""):
+    def __init__(self, name: str, command: str, args: List[str], description: str = "",
+                 stderr_lines: int = DEFAULT_STDERR_LINES):
         self.name = name
         self.command = command
         self.args = args
         self.description = description
-        self.process: Optional[subprocess.Popen] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self.stderr_tail = deque(maxlen=stderr_lines)
+        self._stderr_task: Optional[asyncio.Task] = None
         self.available_tools: List[Dict] = []
         self.initialized = False
+        self.startup_time: Optional[float] = None
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._progress_tokens = itertools.count(1)
+        self._progress_handlers: Dict[int, ProgressCallback] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.last_active = time.monotonic()
+        # Calls the pool has handed to this worker that have not finished, counted from dispatch so a
+        # burst of calls sees each other before any request is sent
+        self.reserved = 0
+        
+        # Health bookkeeping maintained by the supervisor
+        self.restart_count = 0
+        self.restart_failures = 0
+        self.missed_pings = 0
+        self.next_restart_at = 0.0
+        self.down_since: Optional[float] = None
+        self._downtime = 0.0
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of requests sent to this server that are still awaiting a response"""
+        return len(self._pending)
+    
+    @property
+    def load(self) -> int:
+        """Calls the pool has dispatched here, or requests in flight if more (e.g. health pings)"""
+        return max(self.reserved, self.in_flight)
+    
+    def is_healthy(self) -> bool:
+        """Check whether the server can accept tool calls"""
+        return self.initialized and self._is_running()
+    
+    @property
+    def downtime(self) -> float:
+        """Total seconds this server has spent down, including any ongoing outage"""
+        if self.down_since is None:
+            return self._downtime
+        return self._downtime + time.monotonic() - self.down_since
+    
+    def mark_down(self):
+        """Start counting downtime"""
+        self.initialized = False
+        if self.down_since is None:
+            self.down_since = time.monotonic()
+    
+    def mark_up(self):
+        """Stop counting downtime"""
+        if self.down_since is not None:
+            self._downtime += time.monotonic() - self.down_since
+            self.down_since = None
     
     async def start(self):
         """Start the MCP server process"""
         try:
-            cmd = [self.command] + self.args
-            self.process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=0
-            )
+            self._stopping = False
+            spawned_at = time.perf_counter()
+            await self._open()
             logger.info(f"Started MCP server: {self.name}")
             
-            # Wait a moment for the server to start
-            await asyncio.sleep(0.5)
-            
-            # Initialize the server
+            # The initialize/tools/list handshake is the readiness signal
             await self._initialize()
             
+            if self.initialized:
+                self.startup_time = time.perf_counter() - spawned_at
+                logger.info(f"MCP server {self.name} ready in {self.startup_time * 1000:.0f} ms")
+        
         except Exception as e:
             logger.error(f"Failed to start MCP server {self.name}: {e}")
             raise
     
+    async def _open(self):
+        """Spawn the server process and start reading its responses"""
+        self.process = await asyncio.create_subprocess_exec(
+            self.command,
+            *self.args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
+        )
+        self._reader = self.process.stdout
+        self._writer = self.process.stdin
+        self._reader_task = asyncio.create_task(self._read_responses())
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+    
+    async def _drain_stderr(self):
+        """Background task: keep the stderr pipe empty, logging and remembering its last lines"""
+        stderr = self.process.stderr
+        while True:
+            try:
+                line = await stderr.readline()
+            except ValueError:
+                # Line longer than the stream limit: drop what is buffered and carry on
+                await stderr.read(STREAM_LIMIT)
+                continue
+            
+            if not line:
+                break
+            
+            text = line.decode(errors="replace").rstrip()
+            self.stderr_tail.append(text)
+            logger.info(f"[{self.name} stderr] {text}")
+    
     async def _initialize(self):
         """Initialize the MCP server"""
         try:
             # Send initialize request
-            init_request = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "initialize",
-                "params": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {}
-                    },
-                    "clientInfo": {
-                        "name": "mcp-local-client",
-                        "version": "1.0.0"
-                    }
+            init_params = {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {
+                    "tools": {}
+                },
+                "clientInfo": {
+                    "name": "mcp-local-client",
+                    "version": "1.0.0"
                 }
             }
             
-            response = await self._send_request(init_request)
+            response = await self._send_request("initialize", init_params)
             if response and "result" in response:
                 self.initialized = True
                 logger.info(f"Initialized MCP server: {self.name}")
                 
                 # Send initialized notification
-                initialized_notification = {
-                    "jsonrpc": "2.0",
-                    "method": "notifications/initialized"
-                }
-                await self._send_notification(initialized_notification)
+                await self._send_notification("notifications/initialized")
                 
                 # Get available tools
                 await self._get_tools()
             else:
                 logger.error(f"Failed to initialize {self.name}: {response}")
-            
+        
         except Exception as e:
             logger.error(f"Failed to initialize MCP server {self.name}: {e}")
     
     async def _get_tools(self):
         """Get available tools from the MCP server"""
         try:
-            tools_request = {
-                "jsonrpc": "2.0",
-                "id": 2,
-                "method": "tools/list",
-                "params": {}
-            }
-            
-            response = await self._send_request(tools_request)
+            response = await self._send_request("tools/list", {})
             
             if response and "result" in response:
                 self.available_tools = response["result"].get("tools", [])
                 logger.info(f"Got {len(self.available_tools)} tools from {self.name}: {[tool.get('name') for tool in self.available_tools]}")
             else:
                 logger.warning(f"No tools result from {self.name}, response: {response}")
-                
+        
         except Exception as e:
             logger.error(f"Failed to get tools from {self.name}: {e}")
     
-    async def _send_request(self, request: Dict) -> Optional[Dict]:
-        """Send a JSON-RPC request to the MCP server"""
-        if not self.process or self.process.poll() is not None:
+    def _is_running(self) -> bool:
+        """Check whether the server process is alive"""
+        return self.process is not None and self.process.returncode is None
+    
+    async def _read_responses(self):
+        """Background task: route each response line to the request waiting on its id"""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Invalid JSON from {self.name}: {line[:200]!r}")
+                    continue
+                
+                if isinstance(message, list):
+                    for item in message:
+                        self._dispatch_response(item)
+                else:
+                    self._dispatch_response(message)
+        
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading from MCP server {self.name}: {e}")
+        finally:
+            if not self._stopping:
+                logger.error(f"MCP server {self.name} exited unexpectedly")
+                self.mark_down()
+            self.initialized = False
+            
+            # The server went away: wake up everyone still waiting on it
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result(None)
+            self._pending.clear()
+    
+    def _dispatch_response(self, message: Dict):
+        """Resolve the pending request matching a response id"""
+        if "id" not in message:
+            self._handle_notification(message)
+            return
+        
+        future = self._pending.pop(message.get("id"), None)
+        if future is None:
+            logger.warning(f"Unmatched message from {self.name}: {message}")
+        elif not future.done():
+            future.set_result(message)
+    
+    def _handle_notification(self, message: Dict):
+        """Route a server notification; progress goes to the callback of the call that asked for it"""
+        if message.get("method") != "notifications/progress":
+            logger.debug(f"Notification from {self.name}: {message}")
+            return
+        
+        params = message.get("params", {})
+        handler = self._progress_handlers.get(params.get("progressToken"))
+        if handler is None:
+            return
+        try:
+            handler(params)
+        except Exception as e:
+            logger.error(f"Error in progress callback for {self.name}: {e}")
+    
+    async def _write_message(self, message: Union[Dict, List[Dict]]):
+        """Write a single JSON-RPC message (or batch) line to the server"""
+        self._writer.write((json.dumps(message) + "\n").encode())
+        await self._writer.drain()
+    
+    def _cancel_request(self, request_id: int, reason: str):
+        """Tell the server to abandon an in-flight request (fire and forget)"""
+        if not self._is_running():
+            return
+        
+        notification = {
+            "jsonrpc": "2.0",
+            "method": "notifications/cancelled",
+            "params": {"requestId": request_id, "reason": reason}
+        }
+        try:
+            self._writer.write((json.dumps(notification) + "\n").encode())
+        except Exception as e:
+            logger.error(f"Error cancelling request {request_id} on {self.name}: {e}")
+    
+    async def _send_request(self, method: str, params: Dict, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Send a JSON-RPC request to the MCP server and wait for its response"""
+        if not self._is_running():
             logger.error(f"MCP server {self.name} is not running")
             return None
         
+        request_id = next(self._request_ids)
+        request = {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": method,
+            "params": params
+        }
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        
         try:
-            request_str = json.dumps(request) + "\n"
-            self.process.stdin.write(request_str)
-            self.process.stdin.flush()
-            
-            # Wait for response
-            await asyncio.sleep(0.1)
-            
-            # Read response
-            response_str = self.process.stdout.readline()
-            if response_str.strip():
-                return json.loads(response_str.strip())
-            else:
-                logger.warning(f"Empty response from {self.name}")
-                return None
-                
+            await self._write_message(request)
+            return await asyncio.wait_for(future, timeout)
+        
+        except asyncio.TimeoutError:
+            logger.warning(f"{method} request {request_id} to {self.name} timed out after {timeout:.2f}s, cancelling")
+            self._cancel_request(request_id, f"Timed out after {timeout:.2f}s")
+            return timeout_response(self.name, method, timeout)
+        except asyncio.CancelledError:
+            self._cancel_request(request_id, "Cancelled by client")
+            raise
         except Exception as e:
             logger.error(f"Error communicating with MCP server {self.name}: {e}")
             return None
+        finally:
+            self._pending.pop(request_id, None)
     
-    async def _send_notification(self, notification: Dict):
+    async def _send_batch(self, calls: List[Tuple[str, Dict]], timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """Send several JSON-RPC requests as one batch line and wait for all responses"""
+        if not self._is_running():
+            logger.error(f"MCP server {self.name} is not running")
+            return [None] * len(calls)
+        
+        loop = asyncio.get_running_loop()
+        batch = []
+        futures = []
+        for method, params in calls:
+            request_id = next(self._request_ids)
+            batch.append({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": method,
+                "params": params
+            })
+            future = loop.create_future()
+            self._pending[request_id] = future
+            futures.append(future)
+        
+        try:
+            await self._write_message(batch)
+            await asyncio.wait(futures, timeout=timeout)
+            
+            responses = []
+            for request, future in zip(batch, futures):
+                if future.done():
+                    responses.append(future.result())
+                else:
+                    self._cancel_request(request["id"], f"Timed out after {timeout:.2f}s")
+                    responses.append(timeout_response(self.name, request["method"], timeout))
+            return responses
+        
+        except asyncio.CancelledError:
+            for request, future in zip(batch, futures):
+                if not future.done():
+                    self._cancel_request(request["id"], "Cancelled by client")
+            raise
+        except Exception as e:
+            logger.error(f"Error sending batch to MCP server {self.name}: {e}")
+            return [None] * len(calls)
+        finally:
+            for request in batch:
+                self._pending.pop(request["id"], None)
+    
+    async def _send_notification(self, method: str, params: Optional[Dict] = None):
         """Send a JSON-RPC notification to the MCP server"""
-        if not self.process or self.process.poll() is not None:
+        if not self._is_running():
             return
         
+        notification = {
+            "jsonrpc": "2.0",
+            "method": method
+        }
+        if params is not None:
+            notification["params"] = params
+        
         try:
-            notification_str = json.dumps(notification) + "\n"
-            self.process.stdin.write(notification_str)
-            self.process.stdin.flush()
+            await self._write_message(notification)
         except Exception as e:
             logger.error(f"Error sending notification to {self.name}: {e}")
     
-    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict]:
-        """Call a tool on the MCP server"""
-        if not self.initialized:
-            logger.error(f"Server {self.name} not initialized")
-            return None
-            
+    async def ping(self, timeout: float) -> bool:
+        """Check that the server still answers requests"""
         try:
-            tool_request = {
+            response = await asyncio.wait_for(self._send_request("ping", {}), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return response is not None and "error" not in response
+    
+    def _attach_stderr(self, response: Optional[Dict]) -> Dict:
+        """Turn a missing response into an error and attach recent stderr output to errors"""
+        if response is None:
+            response = {
                 "jsonrpc": "2.0",
-                "id": 3,
-                "method": "tools/call",
-                "params": {
-                    "name": tool_name,
-                    "arguments": arguments
+                "id": None,
+                "error": {
+                    "code": SERVER_FAILURE_CODE,
+                    "message": f"No response from MCP server {self.name}"
                 }
             }
+        
+        if "error" in response and self.stderr_tail:
+            error = response["error"]
+            data = error.get("data") if isinstance(error.get("data"), dict) else {}
+            error["data"] = dict(data, stderr=list(self.stderr_tail))
+        return response
+    
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = None,
+                        on_progress: Optional[ProgressCallback] = None) -> Optional[Dict]:
+        """Call a tool on the MCP server, cancelling it if it runs past the timeout"""
+        if not self.initialized:
+            logger.error(f"Server {self.name} not initialized")
+            return self._attach_stderr(None)
+        
+        progress_token = None
+        try:
+            params = {
+                "name": tool_name,
+                "arguments": arguments
+            }
+            if on_progress is not None:
+                progress_token = next(self._progress_tokens)
+                self._progress_handlers[progress_token] = on_progress
+                params["_meta"] = {"progressToken": progress_token}
             
-            logger.info(f"Sending tool request to {self.name}: {tool_request}")
-            response = await self._send_request(tool_request)
+            logger.info(f"Sending tool request to {self.name}: {params}")
+            response = await self._send_request("tools/call", params, timeout)
             logger.info(f"Tool response from {self.name}: {response}")
             
-            return response
-            
+            return self._attach_stderr(response)
+        
         except Exception as e:
             logger.error(f"Error calling tool {tool_name} on {self.name}: {e}")
-            return None
+            return self._attach_stderr(None)
+        finally:
+            self._progress_handlers.pop(progress_token, None)
+            self.last_active = time.monotonic()
+    
+    async def call_tools(self, calls: List[Tuple[str, Dict[str, Any]]], timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """Call several tools in a single JSON-RPC batch; responses are returned in call order"""
+        if not self.initialized:
+            logger.error(f"Server {self.name} not initialized")
+            return [self._attach_stderr(None) for _ in calls]
+        
+        try:
+            logger.info(f"Sending batch of {len(calls)} tool requests to {self.name}")
+            responses = await self._send_batch([
+                ("tools/call", {"name": tool_name, "arguments": arguments})
+                for tool_name, arguments in calls
+            ], timeout)
+            return [self._attach_stderr(response) for response in responses]
+        
+        except Exception as e:
+            logger.error(f"Error calling tool batch on {self.name}: {e}")
+            return [self._attach_stderr(None) for _ in calls]
+        finally:
+            self.last_active = time.monotonic()
+    
+    async def restart(self, timeout: float = DEFAULT_STARTUP_TIMEOUT):
+        """Replace the server process and redo the initialize/tools/list handshake"""
+        await self.stop()
+        self.initialized = False
+        self.startup_time = None
+        await asyncio.wait_for(self.start(), timeout=timeout)
     
-    def stop(self):
-        """Stop the MCP server process"""
+    async def stop(self):
+        """Stop the MCP server"""
+        self._stopping = True
+        await self._close()
+    
+    async def _close(self):
+        """Terminate the server process and its reader task"""
         if self.process:
-            self.process.terminate()
-            try:
-                self.process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
+            if self._is_running():
+                self.process.terminate()
+                try:
+                    await asyncio.wait_for(self.process.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    self.process.kill()
+                    await self.process.wait()
+            
+            for task in (self._reader_task, self._stderr_task):
+                if task:
+                    task.cancel()
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        pass
+            self._reader_task = None
+            self._stderr_task = None
+            logger.info(f"Stopped MCP server: {self.name}")
+
+# Server modules loaded for in-process execution, keyed by file path
+_server_modules: Dict[str, Any] = {}
+
+# Server instance owned by a process-executor worker (see _handle_in_worker_process)
+_worker_process_server = None
+
+def _load_server_class(module_path: str, class_name: Optional[str] = None) -> type:
+    """Import an MCP server script by path and return its server class"""
+    module = _server_modules.get(module_path)
+    if module is None:
+        module_name = f"mcp_inprocess_{Path(module_path).stem}"
+        spec = importlib.util.spec_from_file_location(module_name, module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _server_modules[module_path] = module
+    
+    if class_name:
+        return getattr(module, class_name)
+    
+    # Default to the class defined in the script that implements handle_message
+    for value in vars(module).values():
+        if isinstance(value, type) and value.__module__ == module.__name__ and hasattr(value, "handle_message"):
+            return value
+    raise ValueError(f"No MCP server class found in {module_path}")
+
+def _init_worker_process(module_path: str, class_name: Optional[str]):
+    """Process-executor initializer: create the server instance for this worker process"""
+    global _worker_process_server
+    _worker_process_server = _load_server_class(module_path, class_name)()
+
+def _handle_in_worker_process(message: Union[Dict, List[Dict]]) -> Any:
+    """Process-executor entry point: handle a message or batch with this process's server"""
+    if isinstance(message, list):
+        return _worker_process_server.handle_batch(message)
+    return _worker_process_server.handle_message(message)
+
+class InProcessServer(MCPServer):
+    """MCP server whose handle_message is called directly inside the host process"""
+    
+    EXECUTORS = ("inline", "thread", "process")
+    
+    def __init__(self, name: str, module_path: str, class_name: Optional[str] = None,
+                 executor: str = "thread", description: str = ""):
+        super().__init__(name=name, command="", args=[], description=description)
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r} for {name}, expected one of {self.EXECUTORS}")
+        if not module_path:
+            raise ValueError(f"In-process server {name} needs a \"module\" or a script in \"args\"")
+        self.module_path = module_path
+        self.class_name = class_name
+        self.executor = executor
+        self.instance = None
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._in_flight = 0
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of messages currently being handled"""
+        return self._in_flight
+    
+    def _is_running(self) -> bool:
+        """Check whether the server can handle messages"""
+        if self.executor == "process":
+            return self._executor is not None
+        return self.instance is not None
+    
+    async def _open(self):
+        """Instantiate the server class, or a worker process that owns an instance"""
+        if self.executor == "process":
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker_process,
+                initargs=(self.module_path, self.class_name)
+            )
+        else:
+            self.instance = _load_server_class(self.module_path, self.class_name)()
+            # Notifications may be sent from the executor thread; route them on the event loop
+            loop = asyncio.get_running_loop()
+            self.instance.notify = lambda message: loop.call_soon_threadsafe(self._handle_notification, message)
+            if self.executor == "thread":
+                # One thread per worker keeps calls sequential, as in a subprocess server
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1,
+                    thread_name_prefix=f"mcp-{self.name}"
+                )
+    
+    async def _dispatch(self, message: Union[Dict, List[Dict]]) -> Any:
+        """Hand a message or batch to the server instance"""
+        loop = asyncio.get_running_loop()
+        if self.executor == "process":
+            return await loop.run_in_executor(self._executor, _handle_in_worker_process, message)
+        
+        if isinstance(message, list):
+            handler, cheap = self.instance.handle_batch, False
+        else:
+            handler, cheap = self.instance.handle_message, message.get("method") != "tools/call"
+        
+        # Protocol messages are cheap; only tool calls may block
+        if self.executor == "inline" or cheap:
+            return handler(message)
+        return await loop.run_in_executor(self._executor, handler, message)
+    
+    def _cancel_request(self, request_id: int, reason: str):
+        """Flag an abandoned request so the server can stop working on it"""
+        # A process-executor worker only sees notifications after its current call, so skip it
+        if self.instance is None:
+            return
+        
+        try:
+            self.instance.handle_message({
+                "jsonrpc": "2.0",
+                "method": "notifications/cancelled",
+                "params": {"requestId": request_id, "reason": reason}
+            })
+        except Exception as e:
+            logger.error(f"Error cancelling request {request_id} on {self.name}: {e}")
+    
+    async def _send_request(self, method: str, params: Dict, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Handle a JSON-RPC request in process"""
+        if not self._is_running():
+            logger.error(f"MCP server {self.name} is not running")
+            return None
+        
+        request = {
+            "jsonrpc": "2.0",
+            "id": next(self._request_ids),
+            "method": method,
+            "params": params
+        }
+        
+        self._in_flight += 1
+        try:
+            return await asyncio.wait_for(self._dispatch(request), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{method} request {request['id']} to {self.name} timed out after {timeout:.2f}s, abandoning")
+            self._cancel_request(request["id"], f"Timed out after {timeout:.2f}s")
+            return timeout_response(self.name, method, timeout)
+        except asyncio.CancelledError:
+            self._cancel_request(request["id"], "Cancelled by client")
+            raise
+        except concurrent.futures.BrokenExecutor as e:
+            logger.error(f"In-process MCP server {self.name} crashed: {e}")
+            await self._close()
+            self.mark_down()
+            return None
+        except Exception as e:
+            logger.error(f"Error in in-process MCP server {self.name}: {e}")
+            return None
+        finally:
+            self._in_flight -= 1
+    
+    async def _send_batch(self, calls: List[Tuple[str, Dict]], timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """Handle a JSON-RPC batch in process"""
+        if not self._is_running():
+            logger.error(f"MCP server {self.name} is not running")
+            return [None] * len(calls)
+        
+        batch = [
+            {"jsonrpc": "2.0", "id": next(self._request_ids), "method": method, "params": params}
+            for method, params in calls
+        ]
+        
+        self._in_flight += len(batch)
+        try:
+            responses = await asyncio.wait_for(self._dispatch(batch), timeout) or []
+        except asyncio.TimeoutError:
+            for request in batch:
+                self._cancel_request(request["id"], f"Timed out after {timeout:.2f}s")
+            return [timeout_response(self.name, request["method"], timeout) for request in batch]
+        except Exception as e:
+            logger.error(f"Error in in-process MCP server {self.name}: {e}")
+            return [None] * len(calls)
+        finally:
+            self._in_flight -= len(batch)
+        
+        by_id = {response.get("id"): response for response in responses}
+        return [by_id.get(request["id"]) for request in batch]
+    
+    async def _send_notification(self, method: str, params: Optional[Dict] = None):
+        """Deliver a JSON-RPC notification in process"""
+        if not self._is_running():
+            return
+        
+        notification = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            notification["params"] = params
+        
+        try:
+            await self._dispatch(notification)
+        except Exception as e:
+            logger.error(f"Error sending notification to {self.name}: {e}")
+    
+    async def _close(self):
+        """Release the server instance and its executor"""
+        was_running = self._is_running()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.instance = None
+        if was_running:
             logger.info(f"Stopped MCP server: {self.name}")
 
+def parse_socket_address(address: str) -> Tuple[str, Any]:
+    """Split "unix://path" or "tcp://host:port" into a (kind, target) pair"""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        return "tcp", (host or "127.0.0.1", int(port))
+    raise ValueError(f"Unsupported socket address {address!r}, expected unix://path or tcp://host:port")
+
+class SocketMCPServer(MCPServer):
+    """Connection to an MCP server hosted by a shared mcp_daemon over a Unix or TCP socket"""
+    
+    def __init__(self, name: str, address: str, description: str = ""):
+        super().__init__(name=name, command="", args=[], description=description)
+        self.address = address
+    
+    def _is_running(self) -> bool:
+        """Check whether the connection is open"""
+        return (self._writer is not None and not self._writer.is_closing()
+                and self._reader_task is not None and not self._reader_task.done())
+    
+    async def _open(self):
+        """Connect to the daemon and start reading its responses"""
+        kind, target = parse_socket_address(self.address)
+        if kind == "unix":
+            self._reader, self._writer = await asyncio.open_unix_connection(target, limit=STREAM_LIMIT)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(*target, limit=STREAM_LIMIT)
+        self._reader_task = asyncio.create_task(self._read_responses())
+    
+    async def _close(self):
+        """Close the connection and its reader task"""
+        if self._writer is None:
+            return
+        
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+        self._writer = None
+        
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        logger.info(f"Disconnected from MCP server: {self.name}")
+
+class ToolCatalogueCache:
+    """On-disk copy of the last tools/list result of each server"""
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = self._load()
+    
+    def _load(self) -> Dict[str, Dict]:
+        """Load cached catalogues, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        except Exception as e:
+            logger.warning(f"Failed to load tool catalogue cache {self.path}: {e}")
+            return {}
+    
+    def get(self, name: str, server_config: Dict) -> Optional[List[Dict]]:
+        """Return cached tools for a server, provided it is still launched the same way"""
+        entry = self.entries.get(name)
+        if not entry or entry.get("command") != server_config.get("command") or entry.get("args") != server_config.get("args"):
+            return None
+        return entry.get("tools")
+    
+    def put(self, name: str, server_config: Dict, tools: List[Dict]):
+        """Store a server's tools and persist the cache"""
+        entry = {
+            "command": server_config.get("command"),
+            "args": server_config.get("args"),
+            "tools": tools
+        }
+        if self.entries.get(name) == entry:
+            return
+        
+        self.entries[name] = entry
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Failed to save tool catalogue cache {self.path}: {e}")
+
+class MCPServerPool:
+    """Pool of identical MCP server processes serving one configured server name"""
+    
+    def __init__(self, name: str, server_config: Dict, catalogue: Optional[ToolCatalogueCache] = None):
+        self.name = name
+        self.config = server_config
+        self.description = server_config.get("description", "")
+        self.transport = server_config.get("transport", "stdio")
+        self.catalogue = catalogue
+        self.cached_tools: List[Dict] = []
+        
+        pool_size = server_config.get("pool_size", 1)
+        if isinstance(pool_size, dict):
+            self.min_size = max(1, int(pool_size.get("min", 1)))
+            self.max_size = max(self.min_size, int(pool_size.get("max", self.min_size)))
+        else:
+            self.min_size = self.max_size = max(1, int(pool_size))
+        
+        # Lazy pools keep no process until the first call and drop back to zero when idle
+        self.lazy = server_config.get("lazy", False)
+        self.idle_timeout = server_config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)
+        if self.lazy:
+            self.min_size = 0
+        
+        self.startup_timeout = server_config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+        self.call_timeout = server_config.get("timeout", DEFAULT_CALL_TIMEOUT)
+        self.tool_timeouts: Dict[str, float] = server_config.get("tool_timeouts", {})
+        self.scale_up_queue_depth = server_config.get("scale_up_queue_depth", DEFAULT_SCALE_UP_QUEUE_DEPTH)
+        self.scale_down_idle = server_config.get("scale_down_idle", DEFAULT_SCALE_DOWN_IDLE)
+        
+        self.breaker = CircuitBreaker(
+            failure_threshold=server_config.get("circuit_failure_threshold", 3),
+            window=server_config.get("circuit_window", 60.0),
+            reset_timeout=server_config.get("circuit_reset_timeout", 30.0)
+        )
+        
+        self.workers: List[MCPServer] = []
+        self._worker_ids = itertools.count(1)
+        self._spawning = 0
+        self._capacity = asyncio.Condition()
+        self._scaler_task: Optional[asyncio.Task] = None
+    
+    @property
+    def initialized(self) -> bool:
+        """Whether at least one worker is initialized"""
+        return any(worker.initialized for worker in self.workers)
+    
+    @property
+    def available_tools(self) -> List[Dict]:
+        """Tools advertised by the pool's workers"""
+        for worker in self.workers:
+            if worker.initialized:
+                return worker.available_tools
+        return self.cached_tools
+    
+    def find_tool(self, tool_name: str) -> Optional[Dict]:
+        """Look up a tool definition by name"""
+        for tool in self.available_tools:
+            if tool.get("name") == tool_name:
+                return tool
+        return None
+    
+    @property
+    def startup_time(self) -> Optional[float]:
+        """Fastest spawn-to-ready time among the workers"""
+        times = [worker.startup_time for worker in self.workers if worker.startup_time is not None]
+        return min(times) if times else None
+    
+    @property
+    def in_flight(self) -> int:
+        """Calls in flight across all workers"""
+        return sum(worker.load for worker in self.workers)
+    
+    @property
+    def restart_count(self) -> int:
+        """Supervisor restarts across all workers"""
+        return sum(worker.restart_count for worker in self.workers)
+    
+    @property
+    def downtime(self) -> float:
+        """Seconds of downtime across all workers"""
+        return sum(worker.downtime for worker in self.workers)
+    
+    def _unavailable(self) -> Dict:
+        """Error response returned while the circuit breaker is open"""
+        return {
+            "jsonrpc": "2.0",
+            "id": None,
+            "error": {
+                "code": -32000,
+                "message": f"Server {self.name} is unavailable (circuit open), try again later"
+            }
+        }
+    
+    async def start(self):
+        """Start the minimum number of workers and the autoscaler"""
+        if self.lazy and self.catalogue:
+            self.cached_tools = self.catalogue.get(self.name, self.config) or []
+        
+        # A lazy pool without a cached catalogue still needs one worker to list its tools
+        initial_size = self.min_size if self.cached_tools else max(1, self.min_size)
+        await asyncio.gather(*(self._add_worker() for _ in range(initial_size)))
+        
+        if not self.workers and not self.cached_tools:
+            raise RuntimeError(f"No worker of {self.name} became ready")
+        
+        if self.max_size > self.min_size:
+            self._scaler_task = asyncio.create_task(self._autoscale())
+    
+    async def _add_worker(self) -> Optional[MCPServer]:
+        """Spawn one worker process and add it to the pool once it is ready"""
+        worker_name = self.name if self.max_size == 1 else f"{self.name}#{next(self._worker_ids)}"
+        if self.transport == "socket":
+            worker = SocketMCPServer(
+                name=worker_name,
+                address=self.config["address"],
+                description=self.description
+            )
+        elif self.transport == "inprocess":
+            worker = InProcessServer(
+                name=worker_name,
+                module_path=self.config.get("module") or (self.config.get("args") or [""])[0],
+                class_name=self.config.get("class"),
+                executor=self.config.get("executor", "thread"),
+                description=self.description
+            )
+        else:
+            worker = MCPServer(
+                name=worker_name,
+                command=self.config["command"],
+                args=self.config["args"],
+                description=self.description,
+                stderr_lines=self.config.get("stderr_lines", DEFAULT_STDERR_LINES)
+            )
+        
+        try:
+            await asyncio.wait_for(worker.start(), timeout=self.startup_timeout)
+            self.workers.append(worker)
+            if self.catalogue and worker.initialized:
+                self.cached_tools = worker.available_tools
+                self.catalogue.put(self.name, self.config, worker.available_tools)
+            return worker
+        except asyncio.TimeoutError:
+            logger.error(f"Server {worker_name} did not become ready within {self.startup_timeout}s")
+        except Exception as e:
+            logger.error(f"Failed to start server {worker_name}: {e}")
+        
+        await worker.stop()
+        return None
+    
+    def _grow(self):
+        """Spawn an extra worker in the background"""
+        self._spawning += 1
+        asyncio.create_task(self._grow_worker())
+    
+    async def _grow_worker(self):
+        """Add a worker, then wake the calls queued for capacity"""
+        try:
+            await self._add_worker()
+        finally:
+            self._spawning -= 1
+            async with self._capacity:
+                self._capacity.notify_all()
+    
+    def _pick_worker(self) -> Optional[MCPServer]:
+        """Return the healthy worker with the fewest requests in flight"""
+        healthy = [worker for worker in self.workers if worker.is_healthy()]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda worker: worker.load)
+    
+    async def _acquire_worker(self) -> Optional[MCPServer]:
+        """Wait for a worker to dispatch to and reserve it, growing the pool while every worker is busy"""
+        async with self._capacity:
+            worker = await self._wait_for_worker()
+            if worker is not None:
+                worker.reserved += 1
+            return worker
+    
+    async def _wait_for_worker(self) -> Optional[MCPServer]:
+        """Pick a worker to dispatch to (with _capacity held), growing the pool while every worker is busy"""
+        spawned_on_demand = False
+        while True:
+            worker = self._pick_worker()
+            if worker is None:
+                if not self.workers and not self._spawning and not spawned_on_demand and self.max_size > 0:
+                    # Lazy pool with no process yet: spawn one for this call
+                    logger.info(f"Spawning {self.name} on demand")
+                    spawned_on_demand = True
+                    self._grow()
+                elif not self._spawning:
+                    return None
+            elif worker.load < self.scale_up_queue_depth:
+                return worker
+            elif len(self.workers) + self._spawning < self.max_size:
+                logger.info(f"Scaling up {self.name}: {self.in_flight} calls in flight across {len(self.workers)} workers")
+                self._grow()
+            elif not self._spawning:
+                # At capacity: queue behind the least-loaded worker
+                return worker
+            
+            await self._capacity.wait()
+    
+    def timeout_for(self, tool_name: str) -> float:
+        """Deadline for a tool call: the tool's own timeout, else the server's"""
+        return self.tool_timeouts.get(tool_name, self.call_timeout)
+    
+    async def _acquire_before(self, deadline: float) -> Tuple[Optional[MCPServer], float]:
+        """Acquire a worker, returning it with the time left until the deadline"""
+        remaining = deadline - time.monotonic()
+        try:
+            worker = await asyncio.wait_for(self._acquire_worker(), max(remaining, 0))
+        except asyncio.TimeoutError:
+            logger.warning(f"No worker of {self.name} became free before the deadline")
+            return None, 0.0
+        return worker, max(deadline - time.monotonic(), 0.0)
+    
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = None,
+                        on_progress: Optional[ProgressCallback] = None) -> Optional[Dict]:
+        """Call a tool on the least-loaded healthy worker within its deadline"""
+        if not self.breaker.allow():
+            return self._unavailable()
+        
+        try:
+            timeout = timeout if timeout is not None else self.timeout_for(tool_name)
+            worker, remaining = await self._acquire_before(time.monotonic() + timeout)
+            if worker is None:
+                logger.error(f"No healthy worker available for server {self.name}")
+                self.breaker.record_failure()
+                return timeout_response(self.name, tool_name, timeout) if remaining == 0.0 else None
+            
+            try:
+                response = await worker.call_tool(tool_name, arguments, remaining, on_progress)
+                if is_server_failure(response):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                return response
+            finally:
+                async with self._capacity:
+                    worker.reserved -= 1
+                    self._capacity.notify()
+        finally:
+            # A cancelled trial call has no outcome; let the next call probe the server instead
+            self.breaker.release_trial()
+    
+    async def call_tools(self, calls: List[Tuple[str, Dict[str, Any]]], timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """Send a batch of tool calls to the least-loaded healthy worker within the batch deadline"""
+        if not self.breaker.allow():
+            return [self._unavailable() for _ in calls]
+        
+        try:
+            # A batch may run as long as its slowest tool is allowed to
+            if timeout is None:
+                timeout = max(self.timeout_for(tool_name) for tool_name, _ in calls)
+            worker, remaining = await self._acquire_before(time.monotonic() + timeout)
+            if worker is None:
+                logger.error(f"No healthy worker available for server {self.name}")
+                self.breaker.record_failure()
+                if remaining == 0.0:
+                    return [timeout_response(self.name, tool_name, timeout) for tool_name, _ in calls]
+                return [None] * len(calls)
+            
+            try:
+                responses = await worker.call_tools(calls, remaining)
+                if any(is_server_failure(response) for response in responses):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                return responses
+            finally:
+                async with self._capacity:
+                    worker.reserved -= 1
+                    self._capacity.notify()
+        finally:
+            self.breaker.release_trial()
+    
+    async def _autoscale(self):
+        """Background task: retire surplus workers that have been idle for a while"""
+        while True:
+            await asyncio.sleep(SCALE_CHECK_INTERVAL)
+            
+            now = time.monotonic()
+            for worker in list(self.workers):
+                if len(self.workers) <= self.min_size:
+                    break
+                # The last worker of a lazy pool gets the longer idle timeout
+                idle_limit = self.idle_timeout if len(self.workers) == 1 else self.scale_down_idle
+                if worker.load == 0 and now - worker.last_active >= idle_limit:
+                    logger.info(f"Scaling down {self.name}: stopping idle worker {worker.name}")
+                    self.workers.remove(worker)
+                    await worker.stop()
+    
+    async def stop(self):
+        """Stop the autoscaler and every worker"""
+        if self._scaler_task:
+            self._scaler_task.cancel()
+            self._scaler_task = None
+        
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        self.workers.clear()
+
 class MCPHost:
     """MCP Host that manages multiple MCP servers"""
     
     def __init__(self, config_path: str = "config/mcp_config.json"):
         self.config_path = config_path
-        self.servers: Dict[str, MCPServer] = {}
+        self.servers: Dict[str, MCPServerPool] = {}
         self.config = self._load_config()
+        self.tool_cache = ToolResultCache.from_config(self.config)
+        self.tool_catalogue = ToolCatalogueCache(self.config.get("tool_catalogue_cache", DEFAULT_TOOL_CATALOGUE_CACHE))
+        self.supervisor = MCPSupervisor(self, self.config.get("supervisor", {}))
     
     def _load_config(self) -> Dict:
         """Load configuration from JSON file"""
@@ -198,31 +1141,142 @@ class MCPHost:
             return {}
     
     async def start_all_servers(self):
-        """Start all configured MCP servers"""
+        """Start all configured MCP servers concurrently"""
         mcp_servers_config = self.config.get("mcp_servers", {})
         
-        for name, server_config in mcp_servers_config.items():
-            try:
-                server = MCPServer(
-                    name=name,
-                    command=server_config["command"],
-                    args=server_config["args"],
-                    description=server_config.get("description", "")
-                )
-                
-                await server.start()
-                self.servers[name] = server
-                
-            except Exception as e:
-                logger.error(f"Failed to start server {name}: {e}")
+        await asyncio.gather(*(
+            self._start_server(name, server_config)
+            for name, server_config in mcp_servers_config.items()
+        ))
+        
+        ready = {name: server.startup_time for name, server in self.servers.items() if server.startup_time is not None}
+        deferred = [name for name, server in self.servers.items() if not server.workers]
+        logger.info(f"Started {len(ready)}/{len(mcp_servers_config)} MCP servers: "
+                    f"{', '.join(f'{name}={elapsed * 1000:.0f}ms' for name, elapsed in ready.items())}")
+        if deferred:
+            logger.info(f"Deferred lazy MCP servers until first use: {', '.join(deferred)}")
+        
+        self.supervisor.start()
     
-    async def call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict]:
-        """Call a tool on a specific MCP server"""
+    async def _start_server(self, name: str, server_config: Dict):
+        """Start the worker pool for a single configured MCP server"""
+        try:
+            if server_config.get("transport") == "socket" and "address" not in server_config:
+                socket_dir = self.config.get("daemon", {}).get("socket_dir", DEFAULT_SOCKET_DIR)
+                server_config = dict(server_config, address=f"unix://{Path(socket_dir) / f'{name}.sock'}")
+            
+            pool = MCPServerPool(name, server_config, self.tool_catalogue)
+            await pool.start()
+            self.servers[name] = pool
+        
+        except Exception as e:
+            logger.error(f"Failed to start server {name}: {e}")
+    
+    async def call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any],
+                        timeout: Optional[float] = None, on_progress: Optional[ProgressCallback] = None) -> Optional[Dict]:
+        """Call a tool on a specific MCP server, serving pure tools from the result cache"""
         if server_name not in self.servers:
             logger.error(f"Server {server_name} not found")
             return None
         
-        return await self.servers[server_name].call_tool(tool_name, arguments)
+        pool = self.servers[server_name]
+        if pool.transport == "socket":
+            # The daemon caches shared servers centrally, so one client's writes invalidate every client's reads
+            return await pool.call_tool(tool_name, arguments, timeout, on_progress)
+        
+        tool_def = pool.find_tool(tool_name)
+        pure = self.tool_cache.is_pure(server_name, tool_name, tool_def)
+        if pure:
+            cached = self.tool_cache.get(server_name, tool_name, arguments)
+            if cached is not None:
+                logger.info(f"Cache hit for {server_name}.{tool_name}")
+                return cached
+        
+        generation = self.tool_cache.generation(server_name)
+        response = await pool.call_tool(tool_name, arguments, timeout, on_progress)
+        self._update_cache(server_name, tool_name, tool_def, arguments, response, generation)
+        return response
+    
+    async def call_tools(self, server_name: str, calls: List[Tuple[str, Dict[str, Any]]],
+                         timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """Call several tools on one MCP server in a single JSON-RPC batch round trip"""
+        if server_name not in self.servers:
+            logger.error(f"Server {server_name} not found")
+            return [None] * len(calls)
+        
+        pool = self.servers[server_name]
+        if pool.transport == "socket":
+            return await pool.call_tools(calls, timeout)
+        
+        responses: List[Optional[Dict]] = [None] * len(calls)
+        misses = []
+        for index, (tool_name, arguments) in enumerate(calls):
+            if self.tool_cache.is_pure(server_name, tool_name, pool.find_tool(tool_name)):
+                responses[index] = self.tool_cache.get(server_name, tool_name, arguments)
+            if responses[index] is None:
+                misses.append(index)
+        
+        if misses:
+            generation = self.tool_cache.generation(server_name)
+            batch_responses = await pool.call_tools([calls[index] for index in misses], timeout)
+            for index, response in zip(misses, batch_responses):
+                tool_name, arguments = calls[index]
+                responses[index] = response
+                self._update_cache(server_name, tool_name, pool.find_tool(tool_name), arguments, response, generation)
+        
+        return responses
+    
+    def _orders_calls(self, server_name: str, tool_name: str) -> bool:
+        """Whether a tool may overwrite or delete state, so calls around it on its server must keep their order"""
+        pool = self.servers.get(server_name)
+        annotations = ((pool.find_tool(tool_name) if pool else None) or {}).get("annotations", {})
+        if annotations.get("readOnlyHint", False):
+            return False
+        # Per the MCP spec a tool that is not read-only is destructive unless it says otherwise
+        return annotations.get("destructiveHint", True)
+    
+    async def call_many(self, calls: List[Tuple[str, str, Dict[str, Any]]], max_concurrency: int = 4,
+                        on_progress: Optional[ProgressCallback] = None) -> List[Optional[Dict]]:
+        """Run (server, tool, arguments) calls concurrently, at most max_concurrency at a time"""
+        # Calls on different servers are independent. On one server, read-only and additive calls run
+        # in parallel, while a destructive call waits for the calls before it and holds back the calls
+        # after it, so e.g. a read_file issued after a write_file sees the written content.
+        semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        responses: List[Optional[Dict]] = [None] * len(calls)
+        
+        async def run(index: int):
+            server_name, tool_name, arguments = calls[index]
+            async with semaphore:
+                try:
+                    responses[index] = await self.call_tool(server_name, tool_name, arguments, on_progress=on_progress)
+                except Exception as e:
+                    logger.error(f"Tool call {tool_name} on {server_name} failed: {e}")
+        
+        async def run_lane(indexes: List[int]):
+            parallel = []
+            for index in indexes:
+                if self._orders_calls(calls[index][0], calls[index][1]):
+                    await asyncio.gather(*(run(i) for i in parallel))
+                    parallel = []
+                    await run(index)
+                else:
+                    parallel.append(index)
+            await asyncio.gather(*(run(i) for i in parallel))
+        
+        lanes: Dict[str, List[int]] = {}
+        for index, (server_name, _, _) in enumerate(calls):
+            lanes.setdefault(server_name, []).append(index)
+        await asyncio.gather(*(run_lane(indexes) for indexes in lanes.values()))
+        return responses
+    
+    def _update_cache(self, server_name: str, tool_name: str, tool_def: Optional[Dict],
+                      arguments: Dict[str, Any], response: Optional[Dict], generation: int):
+        """Store a pure tool's result, or invalidate what a mutating tool may have changed"""
+        if self.tool_cache.is_pure(server_name, tool_name, tool_def):
+            if response is not None:
+                self.tool_cache.put(server_name, tool_name, arguments, response, generation)
+        elif self.tool_cache.is_mutating(server_name, tool_name, tool_def):
+            self.tool_cache.invalidate(server_name, arguments)
     
     def get_available_tools(self) -> Dict[str, List[Dict]]:
         """Get all available tools from all servers"""
@@ -231,8 +1285,8 @@ class MCPHost:
             tools[name] = server.available_tools
         return tools
     
-    def stop_all_servers(self):
+    async def stop_all_servers(self):
         """Stop all MCP servers"""
-        for server in self.servers.values():
-            server.stop()
+        await self.supervisor.stop()
+        await asyncio.gather(*(server.stop() for server in self.servers.values()))
         self.servers.clear()
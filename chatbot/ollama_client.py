@@ -1,19 +1,181 @@
-import requests
+import aiohttp
+import asyncio
 import json
-from typing import Dict, Any, Optional, List
+import time
+from contextlib import nullcontext
+from typing import AsyncIterator, Dict, Any, Optional, List
 import logging
 
+from llm_cache import LLMResponseCache
+from llm_scheduler import LLMScheduler
+
 logger = logging.getLogger(__name__)
 
+class OllamaBackend:
+    """One Ollama server the client can route requests to"""
+    
+    def __init__(self, base_url: str, model: str, weight: float = 1.0):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.weight = weight
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+    
+    def load(self) -> tuple:
+        """Routing key: outstanding requests per unit of weight, then total requests per unit of weight"""
+        return ((self.outstanding + 1) / self.weight, self.requests / self.weight)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary for the debug command and the chat server's /stats"""
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
 class OllamaClient:
-    """Client for interacting with Ollama LLM"""
+    """Async client for interacting with Ollama LLM over a pooled keep-alive HTTP session"""
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2",
+                 timeout: float = 30.0, connect_timeout: float = 5.0, max_connections: int = 4,
+                 keep_alive: Optional[Any] = None, options: Optional[Dict[str, Any]] = None,
+                 cache: Optional[LLMResponseCache] = None, scheduler: Optional[LLMScheduler] = None,
+                 backends: Optional[List[OllamaBackend]] = None, health_check_interval: float = 10.0):
         self.base_url = base_url.rstrip('/')
         self.model = model
-        self.session = requests.Session()
+        # Requests go to the healthy backend with the fewest outstanding requests per unit of weight
+        self.backends = backends or [OllamaBackend(base_url, model)]
+        self.health_check_interval = health_check_interval
+        self._health_task: Optional[asyncio.Task] = None
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        # Connections per backend, so every backend added brings its own
+        self.max_connections = max_connections
+        # How long Ollama keeps the model loaded after a request, e.g. "30m" or -1 (forever)
+        self.keep_alive = keep_alive
+        # Model options sent with every request, e.g. {"temperature": 0}
+        self.options = options or {}
+        self.cache = cache
+        # Limits generations in flight at Ollama (per healthy backend) and orders the waiting ones;
+        # None sends everything at once
+        self.scheduler = scheduler
+        if scheduler is not None:
+            scheduler.set_backends(len(self.backends))
+        self.session: Optional[aiohttp.ClientSession] = None
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], cache: Optional[LLMResponseCache] = None) -> "OllamaClient":
+        """Build a client from the "ollama" block of mcp_config.json"""
+        base_url = config.get("base_url", "http://localhost:11434")
+        model = config.get("model", "llama3.2")
+        backends = [
+            OllamaBackend(backend.get("base_url", base_url), backend.get("model", model), backend.get("weight", 1.0))
+            for backend in config.get("backends", [])
+        ]
+        return cls(
+            base_url=base_url,
+            model=model,
+            backends=backends,
+            health_check_interval=config.get("health_check_interval", 10.0),
+            timeout=config.get("timeout", 30.0),
+            connect_timeout=config.get("connect_timeout", 5.0),
+            max_connections=config.get("max_connections", 4),
+            keep_alive=config.get("keep_alive"),
+            options=config.get("options"),
+            cache=cache,
+            scheduler=LLMScheduler.from_config(config)
+        )
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use inside the running event loop"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections * len(self.backends),
+                                               limit_per_host=self.max_connections)
+            )
+        return self.session
+    
+    def _with_defaults(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the configured keep_alive and options unless the caller passed its own"""
+        if self.keep_alive is not None:
+            payload.setdefault("keep_alive", self.keep_alive)
+        if self.options:
+            payload["options"] = {**self.options, **payload.get("options", {})}
+        return payload
     
-    def generate(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> str:
+    def _slot(self, priority: str, session: Optional[str]):
+        """Scheduler slot for one generation, or a no-op without a scheduler"""
+        if self.scheduler is None:
+            return nullcontext(0.0)
+        return self.scheduler.slot(priority, session)
+    
+    def _set_healthy(self, backend: OllamaBackend, healthy: bool):
+        """Mark a backend up or down, scaling the scheduler's limit with the healthy backends"""
+        if backend.healthy == healthy:
+            return
+        backend.healthy = healthy
+        if self.scheduler is not None:
+            self.scheduler.set_backends(sum(1 for candidate in self.backends if candidate.healthy))
+    
+    def _pick_backend(self, tried: List[OllamaBackend]) -> OllamaBackend:
+        """Least-loaded healthy backend not tried yet for this request"""
+        candidates = [backend for backend in self.backends if backend.healthy and backend not in tried]
+        if not candidates:
+            # Every untried backend is marked down; one of them may have recovered since the last check
+            candidates = [backend for backend in self.backends if backend not in tried]
+        return min(candidates, key=OllamaBackend.load)
+    
+    def _fail_over(self, backend: OllamaBackend, error: Exception, tried: List[OllamaBackend]) -> bool:
+        """Mark a backend down after a failure; returns whether the request should move to another backend"""
+        if isinstance(error, aiohttp.ClientResponseError) and 400 <= error.status < 500 and error.status != 404:
+            # The request itself was rejected, so another backend would reject it too
+            return False
+        
+        backend.failures += 1
+        backend.last_error = repr(error) if isinstance(error, asyncio.TimeoutError) else str(error)
+        if backend.healthy:
+            logger.warning(f"Ollama backend {backend.base_url} marked down: {backend.last_error}")
+        self._set_healthy(backend, False)
+        return len(tried) < len(self.backends)
+    
+    async def _post_to(self, backend: OllamaBackend, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a payload to one backend, with the model it serves"""
+        backend.outstanding += 1
+        backend.requests += 1
+        try:
+            async with self._get_session().post(f"{backend.base_url}{path}",
+                                                json={**payload, "model": backend.model}) as response:
+                response.raise_for_status()
+                self._set_healthy(backend, True)
+                return await response.json(content_type=None)
+        finally:
+            backend.outstanding -= 1
+    
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a JSON payload to the Ollama API and return the decoded JSON body, failing over between backends"""
+        payload = self._with_defaults(payload)
+        tried = []
+        while True:
+            backend = self._pick_backend(tried)
+            tried.append(backend)
+            try:
+                return await self._post_to(backend, path, payload)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not self._fail_over(backend, e, tried):
+                    raise
+                logger.warning(f"Retrying Ollama request on another backend after {backend.base_url} failed")
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None, priority: str = "interactive",
+                       session: Optional[str] = None, **kwargs) -> str:
         """Generate response from Ollama"""
         try:
             payload = {
@@ -26,54 +188,208 @@ class OllamaClient:
             if system_prompt:
                 payload["system"] = system_prompt
             
-            response = self.session.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            result = response.json()
+            async with self._slot(priority, session):
+                result = await self._post("/api/generate", payload)
             return result.get("response", "")
-            
-        except requests.exceptions.RequestException as e:
+        
+        except asyncio.TimeoutError:
+            logger.error(f"Ollama request failed: no response within {self.timeout}s")
+            return f"Error communicating with Ollama: no response within {self.timeout}s"
+        except aiohttp.ClientError as e:
             logger.error(f"Ollama request failed: {e}")
             return f"Error communicating with Ollama: {e}"
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return f"Unexpected error: {e}"
     
-    def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+    async def chat(self, messages: List[Dict[str, str]], priority: str = "interactive",
+                   session: Optional[str] = None, **kwargs) -> str:
         """Chat interface for Ollama"""
         try:
-            payload = {
+            payload = self._with_defaults({
                 "model": self.model,
                 "messages": messages,
                 "stream": False,
                 **kwargs
-            }
+            })
             
-            response = self.session.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
+            cache_key = self.cache.key(payload) if self.cache else None
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached.get("content", "")
             
-            result = response.json()
+            async with self._slot(priority, session):
+                result = await self._post("/api/chat", payload)
+            if cache_key is not None and result.get("done", True) and "message" in result:
+                self.cache.put(cache_key, self.model, result["message"])
             return result.get("message", {}).get("content", "")
-            
-        except requests.exceptions.RequestException as e:
+        
+        except asyncio.TimeoutError:
+            logger.error(f"Ollama chat request failed: no response within {self.timeout}s")
+            return f"Error communicating with Ollama: no response within {self.timeout}s"
+        except aiohttp.ClientError as e:
             logger.error(f"Ollama chat request failed: {e}")
             return f"Error communicating with Ollama: {e}"
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return f"Unexpected error: {e}"
     
-    def is_available(self) -> bool:
-        """Check if Ollama is available"""
+    async def chat_stream(self, messages: List[Dict[str, str]], priority: str = "interactive",
+                          session: Optional[str] = None, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a chat completion, yielding each NDJSON chunk as Ollama sends it"""
+        payload = self._with_defaults({
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            **kwargs
+        })
+        
+        cache_key = self.cache.key(payload) if self.cache else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield {"message": cached, "done": True, "cached": True}
+                return
+        
+        # A long generation may exceed the total timeout, so only a stall between chunks counts
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.timeout)
+        
+        async with self._slot(priority, session) as queue_wait:
+            tried = []
+            while True:
+                backend = self._pick_backend(tried)
+                tried.append(backend)
+                backend.outstanding += 1
+                backend.requests += 1
+                streamed = False
+                try:
+                    async with self._get_session().post(f"{backend.base_url}/api/chat", timeout=timeout,
+                                                        json={**payload, "model": backend.model}) as response:
+                        response.raise_for_status()
+                        self._set_healthy(backend, True)
+                        parts = []
+                        tool_calls = []
+                        async for line in response.content:
+                            if not line.strip():
+                                continue
+                            chunk = json.loads(line)
+                            if "error" in chunk:
+                                logger.error(f"Ollama chat stream failed: {chunk['error']}")
+                                yield self._error_chunk(f"Error from Ollama: {chunk['error']}")
+                                return
+                            
+                            parts.append(chunk.get("message", {}).get("content", ""))
+                            tool_calls.extend(chunk.get("message", {}).get("tool_calls") or [])
+                            if chunk.get("done"):
+                                chunk["queue_wait"] = queue_wait
+                            if chunk.get("done") and cache_key is not None:
+                                message = {"role": "assistant", "content": "".join(parts)}
+                                if tool_calls:
+                                    message["tool_calls"] = tool_calls
+                                self.cache.put(cache_key, self.model, message)
+                            streamed = True
+                            yield chunk
+                    return
+                
+                except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                    # Once part of a reply has been shown it cannot be replayed from another backend
+                    if self._fail_over(backend, e, tried) and not streamed:
+                        logger.warning(f"Retrying Ollama chat stream on another backend after {backend.base_url} failed")
+                        continue
+                    if isinstance(e, asyncio.TimeoutError):
+                        logger.error(f"Ollama chat stream stalled for {self.timeout}s")
+                        yield self._error_chunk(f"Error communicating with Ollama: no data within {self.timeout}s")
+                    else:
+                        logger.error(f"Ollama chat stream failed: {e}")
+                        yield self._error_chunk(f"Error communicating with Ollama: {e}")
+                    return
+                except json.JSONDecodeError as e:
+                    logger.error(f"Invalid chunk in Ollama chat stream: {e}")
+                    yield self._error_chunk(f"Unexpected error: {e}")
+                    return
+                finally:
+                    backend.outstanding -= 1
+    
+    @staticmethod
+    def _error_chunk(message: str) -> Dict[str, Any]:
+        """Final stream chunk carrying an error message as the reply, like chat() returns it"""
+        return {"message": {"role": "assistant", "content": message}, "done": True}
+    
+    async def warm_up(self, messages: Optional[List[Dict[str, str]]] = None, **kwargs) -> bool:
+        """Load the model on every healthy backend before the first turn, priming its prompt cache if given"""
+        if messages:
+            # Generating a single token is enough to evaluate (and cache) the prompt
+            path, payload = "/api/chat", self._with_defaults({
+                "model": self.model,
+                "messages": messages,
+                "stream": False,
+                "options": {"num_predict": 1},
+                **kwargs
+            })
+        else:
+            # A generate request without a prompt only loads the model
+            path, payload = "/api/generate", self._with_defaults({"model": self.model})
+        
+        backends = [backend for backend in self.backends if backend.healthy]
+        async with self._slot("background", None):
+            results = await asyncio.gather(*(self._warm_up_backend(backend, path, payload) for backend in backends))
+        return any(results)
+    
+    async def _warm_up_backend(self, backend: OllamaBackend, path: str, payload: Dict[str, Any]) -> bool:
+        """Warm up one backend"""
+        started = time.perf_counter()
         try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
+            await self._post_to(backend, path, payload)
+            logger.info(f"Warmed up {backend.model} on {backend.base_url} in {time.perf_counter() - started:.2f}s")
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Warm-up of {backend.model} on {backend.base_url} got no response within {self.timeout}s")
+            return False
+        except aiohttp.ClientError as e:
+            logger.warning(f"Warm-up of {backend.model} on {backend.base_url} failed: {e}")
             return False
+    
+    async def _probe(self, backend: OllamaBackend) -> bool:
+        """Health probe of one backend, updating whether requests are routed to it"""
+        try:
+            async with self._get_session().get(
+                f"{backend.base_url}/api/tags",
+                timeout=aiohttp.ClientTimeout(total=self.connect_timeout)
+            ) as response:
+                available = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            available = False
+        
+        if available != backend.healthy:
+            logger.info(f"Ollama backend {backend.base_url} is {'back up' if available else 'down'}")
+        self._set_healthy(backend, available)
+        return available
+    
+    async def is_available(self) -> bool:
+        """Check if Ollama is available (on at least one backend)"""
+        return any(await asyncio.gather(*(self._probe(backend) for backend in self.backends)))
+    
+    def start_health_checks(self):
+        """Probe every backend in the background so failed ones rejoin and idle ones are caught going down"""
+        if len(self.backends) > 1 and self.health_check_interval and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+    
+    async def _health_loop(self):
+        """Run the health probes every health_check_interval seconds"""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(*(self._probe(backend) for backend in self.backends))
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-backend routing counters"""
+        return [backend.to_dict() for backend in self.backends]
+    
+    async def close(self):
+        """Stop the health checks and close the pooled HTTP session"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
@@ -0,0 +1,107 @@
+import ast
+import json
+import logging
+from typing import Callable, Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class ResultRenderer:
+    """Turns simple tool results into replies with per-tool templates instead of a second LLM round trip"""
+    
+    def __init__(self, catalogue: Callable[[], Dict[str, List[Dict]]], templates: Optional[Dict[str, str]] = None,
+                 enabled: bool = True, llm_fallback: bool = True, max_chars: int = 600):
+        self.catalogue = catalogue
+        # "server.tool" or "tool" -> template; these override a tool definition's _meta.responseTemplate
+        self.templates = templates or {}
+        self.enabled = enabled
+        # Let the LLM summarize results without a template and results longer than max_chars
+        self.llm_fallback = llm_fallback
+        self.max_chars = max_chars
+        self.rendered = 0
+        self.summarized = 0
+    
+    @classmethod
+    def from_config(cls, config: Dict, catalogue: Callable[[], Dict[str, List[Dict]]]) -> "ResultRenderer":
+        """Build a renderer from the result_rendering block"""
+        render_config = config.get("result_rendering", {})
+        return cls(
+            catalogue=catalogue,
+            templates=render_config.get("templates"),
+            enabled=render_config.get("enabled", True),
+            llm_fallback=render_config.get("llm_fallback", True),
+            max_chars=render_config.get("max_chars", 600)
+        )
+    
+    def _definition(self, server: str, tool: str) -> Dict:
+        """The tool's definition from the catalogue, or an empty dict"""
+        for definition in self.catalogue().get(server, []):
+            if definition.get("name") == tool:
+                return definition
+        return {}
+    
+    def template_for(self, server: str, tool: str, definition: Dict) -> Optional[str]:
+        """Configured template for the tool, else the one its server ships in the tool definition"""
+        return (self.templates.get(f"{server}.{tool}") or self.templates.get(tool)
+                or (definition.get("_meta") or {}).get("responseTemplate"))
+    
+    @staticmethod
+    def _fields(server: str, tool: str, arguments: Dict[str, Any], text: str, definition: Dict) -> Dict[str, Any]:
+        """Template fields: the arguments (with schema defaults), the result and, for list results, its items"""
+        properties = definition.get("inputSchema", {}).get("properties", {})
+        fields = {name: spec["default"] for name, spec in properties.items() if "default" in spec}
+        fields.update(arguments)
+        fields.update({"server": server, "tool": tool, "result": text})
+        
+        try:
+            value = json.loads(text)
+        except ValueError:
+            try:
+                value = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                value = None
+        if isinstance(value, list):
+            fields["items"] = ", ".join(str(item) for item in value) or "none"
+            fields["count"] = len(value)
+        return fields
+    
+    def render(self, server: str, tool: str, arguments: Dict[str, Any], text: str,
+               allow_llm: bool = True) -> Optional[str]:
+        """Return the reply for a tool result, or None when the LLM should summarize it"""
+        if self.enabled:
+            definition = self._definition(server, tool)
+            template = self.template_for(server, tool, definition)
+            if template and not (allow_llm and self.llm_fallback and len(text) > self.max_chars):
+                try:
+                    reply = template.format_map(self._fields(server, tool, arguments, text, definition))
+                    self.rendered += 1
+                    return reply
+                except (KeyError, IndexError, ValueError) as e:
+                    # e.g. {items} on a result that is an error message rather than a list
+                    logger.info(f"Template for {server}.{tool} does not fit result ({e!r})")
+            if not (allow_llm and self.llm_fallback):
+                self.rendered += 1
+                return text
+        
+        if allow_llm:
+            self.summarized += 1
+            return None
+        return text
+    
+    def render_error(self, server: str, tool: str, error_msg: str, allow_llm: bool = True) -> Optional[str]:
+        """Return the reply for a failed tool call, or None when the LLM should explain it"""
+        # With the LLM fallback on, the model sees the error and can correct its call
+        if not allow_llm or (self.enabled and not self.llm_fallback):
+            self.rendered += 1
+            return f"Tool call failed with error: {error_msg}"
+        self.summarized += 1
+        return None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the debug command"""
+        total = self.rendered + self.summarized
+        return {
+            "enabled": self.enabled,
+            "rendered": self.rendered,
+            "summarized": self.summarized,
+            "rendered_rate": self.rendered / total if total else 0.0
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Fails calls fast once a server has failed too often within a time window"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+    
+    def __init__(self, failure_threshold: int = 3, window: float = 60.0, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self._failures = deque()
+        self._trial_in_flight = False
+    
+    def allow(self) -> bool:
+        """Check whether a call may go through"""
+        if self.state == self.CLOSED:
+            return True
+        
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Let a single trial call probe the server
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        
+        return False
+    
+    def record_success(self):
+        """Record a successful call or health check"""
+        if self.state == self.HALF_OPEN:
+            logger.info("Circuit closed after successful trial call")
+            self.state = self.CLOSED
+            self._failures.clear()
+        self._trial_in_flight = False
+    
+    def release_trial(self):
+        """Free the trial slot of a call that ended without an outcome, e.g. because it was cancelled"""
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        """Record a failed call, crash or missed health check"""
+        now = time.monotonic()
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        
+        if self.state == self.HALF_OPEN or len(self._failures) >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = now
+        self._trial_in_flight = False
+
+class MCPSupervisor:
+    """Keeps the MCP server pools of an MCPHost alive"""
+    
+    def __init__(self, host, config: Optional[Dict] = None):
+        config = config or {}
+        self.host = host
+        self.interval = config.get("health_check_interval", 5.0)
+        self.ping_timeout = config.get("ping_timeout", 2.0)
+        self.max_missed_pings = config.get("max_missed_pings", 3)
+        self.backoff_base = config.get("restart_backoff", 1.0)
+        self.backoff_max = config.get("restart_backoff_max", 30.0)
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the background health check loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the health check loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        """Periodically check every worker of every pool"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"Supervisor check failed: {e}")
+    
+    async def check_all(self):
+        """Run one round of health checks"""
+        await asyncio.gather(*(
+            self._check_worker(pool, worker)
+            for pool in list(self.host.servers.values())
+            for worker in list(pool.workers)
+        ))
+    
+    async def _check_worker(self, pool, worker):
+        """Ping a worker, restarting it if it crashed or stopped answering"""
+        if worker.is_healthy():
+            # A busy worker answers pings only after its current call, so skip it
+            if worker.in_flight:
+                return
+            
+            if await worker.ping(self.ping_timeout):
+                worker.missed_pings = 0
+                worker.restart_failures = 0
+                # An answered ping closes a half-open breaker just like a successful trial call
+                pool.breaker.record_success()
+                return
+            
+            worker.missed_pings += 1
+            pool.breaker.record_failure()
+            logger.warning(f"MCP server {worker.name} missed {worker.missed_pings} ping(s)")
+            if worker.missed_pings < self.max_missed_pings:
+                return
+            
+            worker.mark_down()
+        
+        await self._restart(pool, worker)
+    
+    async def _restart(self, pool, worker):
+        """Restart a dead worker, backing off exponentially between failed attempts"""
+        now = time.monotonic()
+        if now < worker.next_restart_at:
+            return
+        
+        worker.mark_down()
+        pool.breaker.record_failure()
+        worker.restart_count += 1
+        logger.warning(f"Restarting MCP server {worker.name} (restart #{worker.restart_count})")
+        
+        try:
+            await worker.restart(pool.startup_timeout)
+        except Exception as e:
+            logger.error(f"Failed to restart MCP server {worker.name}: {e}")
+        
+        if worker.is_healthy():
+            worker.mark_up()
+            worker.missed_pings = 0
+            logger.info(f"MCP server {worker.name} is back after {worker.downtime:.1f}s total downtime")
+        else:
+            delay = min(self.backoff_base * (2 ** worker.restart_failures), self.backoff_max)
+            worker.restart_failures += 1
+            worker.next_restart_at = time.monotonic() + delay
+            logger.warning(f"MCP server {worker.name} still down, next restart in {delay:.1f}s")
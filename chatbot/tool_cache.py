@@ -0,0 +1,138 @@
+import copy
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Any, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ToolResultCache:
+    """LRU cache of tool results for pure tools, with per-tool TTLs and path-based invalidation"""
+    
+    def __init__(self, max_entries: int = 256, default_ttl: float = 300.0, enabled: bool = True):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # (server, tool, canonical arguments) -> (expires_at, resource path, response)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Optional[str], Dict]]" = OrderedDict()
+        self._overrides: Dict[str, Dict[str, Dict]] = {}
+        # Bumped on every invalidation so results of calls that raced a write are not stored
+        self._generations: Dict[str, int] = defaultdict(int)
+    
+    @classmethod
+    def from_config(cls, config: Dict) -> "ToolResultCache":
+        """Build a cache from the tool_cache block and the per-server cache overrides"""
+        cache_config = config.get("tool_cache", {})
+        cache = cls(
+            max_entries=cache_config.get("max_entries", 256),
+            default_ttl=cache_config.get("default_ttl", 300.0),
+            enabled=cache_config.get("enabled", True)
+        )
+        for name, server_config in config.get("mcp_servers", {}).items():
+            cache._overrides[name] = server_config.get("cache", {})
+        return cache
+    
+    def _override(self, server: str, tool: str) -> Dict:
+        """Per-tool cache settings from the server's config"""
+        return self._overrides.get(server, {}).get(tool, {})
+    
+    def is_pure(self, server: str, tool: str, tool_def: Optional[Dict]) -> bool:
+        """Whether results of a tool may be cached (config wins over the tool's annotations)"""
+        if not self.enabled:
+            return False
+        
+        override = self._override(server, tool)
+        if "pure" in override:
+            return bool(override["pure"])
+        
+        annotations = (tool_def or {}).get("annotations", {})
+        return (annotations.get("readOnlyHint", False)
+                and annotations.get("idempotentHint", False)
+                and not annotations.get("openWorldHint", True))
+    
+    def is_mutating(self, server: str, tool: str, tool_def: Optional[Dict]) -> bool:
+        """Whether a tool may change what other tools on the same server return"""
+        if self.is_pure(server, tool, tool_def):
+            return False
+        return not (tool_def or {}).get("annotations", {}).get("readOnlyHint", False)
+    
+    def generation(self, server: str) -> int:
+        """Current invalidation generation of a server"""
+        return self._generations[server]
+    
+    @staticmethod
+    def _key(server: str, tool: str, arguments: Dict[str, Any]) -> Tuple[str, str, str]:
+        """Cache key with the arguments canonicalized"""
+        return (server, tool, json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str))
+    
+    @staticmethod
+    def _resource(arguments: Dict[str, Any]) -> Optional[str]:
+        """Filesystem path a call reads or writes, derived from its filename/directory arguments"""
+        directory = arguments.get("directory")
+        filename = arguments.get("filename")
+        if filename is None and directory is None:
+            return None
+        path = os.path.join(os.path.expanduser(directory or "."), filename or "")
+        return os.path.abspath(path)
+    
+    def get(self, server: str, tool: str, arguments: Dict[str, Any]) -> Optional[Dict]:
+        """Return a cached response, or None on a miss"""
+        key = self._key(server, tool, arguments)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[2])
+    
+    def put(self, server: str, tool: str, arguments: Dict[str, Any], response: Dict, generation: int):
+        """Store a successful response unless the server was invalidated since the call started"""
+        if generation != self._generations[server]:
+            return
+        if "result" not in response or response["result"].get("isError"):
+            return
+        
+        ttl = self._override(server, tool).get("ttl", self.default_ttl)
+        key = self._key(server, tool, arguments)
+        self._entries[key] = (time.monotonic() + ttl, self._resource(arguments), copy.deepcopy(response))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, server: str, arguments: Dict[str, Any]):
+        """Drop entries a mutating call may have made stale"""
+        self._generations[server] += 1
+        path = self._resource(arguments)
+        # A write to a file affects reads of that file and listings of its directory
+        affected: Optional[Set[str]] = None if path is None else {path, os.path.dirname(path)}
+        
+        stale = [
+            key for key, (_, resource, _) in self._entries.items()
+            if key[0] == server and (affected is None or resource is None or resource in affected)
+        ]
+        for key in stale:
+            del self._entries[key]
+        
+        if stale:
+            self.invalidations += len(stale)
+            logger.info(f"Invalidated {len(stale)} cached result(s) on {server}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the debug command"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
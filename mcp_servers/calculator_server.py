@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 import sys
 import json
+import threading
 import math
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
+
+# Larger powers take minutes to compute and cannot be printed anyway
+MAX_RESULT_DIGITS = 4000
 
 class CalculatorServer:
     def __init__(self):
@@ -18,7 +23,9 @@ class CalculatorServer:
                         "b": {"type": "number", "description": "Second number"}
                     },
                     "required": ["a", "b"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{a} + {b} = {result}"}
             },
             {
                 "name": "subtract",
@@ -30,7 +37,9 @@ class CalculatorServer:
                         "b": {"type": "number", "description": "Second number"}
                     },
                     "required": ["a", "b"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{a} - {b} = {result}"}
             },
             {
                 "name": "multiply",
@@ -42,7 +51,9 @@ class CalculatorServer:
                         "b": {"type": "number", "description": "Second number"}
                     },
                     "required": ["a", "b"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{a} × {b} = {result}"}
             },
             {
                 "name": "divide",
@@ -54,7 +65,9 @@ class CalculatorServer:
                         "b": {"type": "number", "description": "Divisor"}
                     },
                     "required": ["a", "b"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{a} ÷ {b} = {result}"}
             },
             {
                 "name": "power",
@@ -66,7 +79,9 @@ class CalculatorServer:
                         "exponent": {"type": "number", "description": "Exponent"}
                     },
                     "required": ["base", "exponent"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{base} ^ {exponent} = {result}"}
             },
             {
                 "name": "square_root",
@@ -77,7 +92,9 @@ class CalculatorServer:
                         "number": {"type": "number", "description": "Number to calculate square root of"}
                     },
                     "required": ["number"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "√{number} = {result}"}
             }
         ]
     
@@ -96,6 +113,8 @@ class CalculatorServer:
         return a / b
     
     def power(self, base: float, exponent: float) -> float:
+        if abs(base) > 1 and exponent > 0 and exponent * math.log10(abs(base)) > MAX_RESULT_DIGITS:
+            raise ValueError(f"Result would have more than {MAX_RESULT_DIGITS} digits")
         return base ** exponent
     
     def square_root(self, number: float) -> float:
@@ -103,7 +122,7 @@ class CalculatorServer:
             raise ValueError("Cannot calculate square root of negative number")
         return math.sqrt(number)
     
-    def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Handle JSON-RPC message (request or notification)"""
         method = message.get("method")
         
@@ -131,6 +150,13 @@ class CalculatorServer:
                 }
             }
         
+        elif method == "ping":
+            return {
+                "jsonrpc": "2.0",
+                "id": message.get("id"),
+                "result": {}
+            }
+        
         elif method == "tools/list":
             return {
                 "jsonrpc": "2.0",
@@ -180,7 +206,7 @@ class CalculatorServer:
                         ]
                     }
                 }
-                
+            
             except Exception as e:
                 return {
                     "jsonrpc": "2.0",
@@ -200,21 +226,69 @@ class CalculatorServer:
                     "message": f"Unknown method: {method}"
                 }
             }
+    
+    def handle_batch(self, messages: List[Any]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Handle a JSON-RPC batch, returning one array of responses (None if all were notifications)"""
+        if not messages:
+            return {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32600,
+                    "message": "Invalid Request: empty batch"
+                }
+            }
+        
+        responses = []
+        for message in messages:
+            if not isinstance(message, dict):
+                responses.append({
+                    "jsonrpc": "2.0",
+                    "id": None,
+                    "error": {
+                        "code": -32600,
+                        "message": "Invalid Request"
+                    }
+                })
+                continue
+            
+            response = self.handle_message(message)
+            if response is not None:
+                responses.append(response)
+        
+        return responses or None
 
 def main():
     try:
         server = CalculatorServer()
         
+        # Tool calls run on a worker thread so pings are answered while one is in progress
+        executor = ThreadPoolExecutor(max_workers=1)
+        write_lock = threading.Lock()
+        
+        def send(response):
+            if response is not None:
+                with write_lock:
+                    print(json.dumps(response))
+                    sys.stdout.flush()
+        
+        def handle(message):
+            try:
+                if isinstance(message, list):
+                    send(server.handle_batch(message))
+                else:
+                    send(server.handle_message(message))
+            except Exception as e:
+                print(f"Error handling request: {e}", file=sys.stderr)
+        
         for line in sys.stdin:
             try:
                 message = json.loads(line.strip())
-                response = server.handle_message(message)
-                
-                # Only send response if it's not None (i.e., not a notification)
-                if response is not None:
-                    print(json.dumps(response))
-                    sys.stdout.flush()
-                    
+                if isinstance(message, list) or message.get("method") == "tools/call":
+                    executor.submit(handle, message)
+                else:
+                    send(server.handle_message(message))
+            
             except json.JSONDecodeError:
                 continue
             except Exception as e:
@@ -226,9 +300,10 @@ def main():
                         "message": f"Parse error: {str(e)}"
                     }
                 }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
-                
+                send(error_response)
+        
+        executor.shutdown(wait=True)
+    
     except Exception as e:
         print(f"Fatal error in calculator server: {e}", file=sys.stderr)
         sys.exit(1)
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 import sys
 import json
+import threading
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union
 
 # Use current working directory as default
 DEFAULT_DIR = "."
 
+class ToolError(Exception):
+    """A failed tool call, reported to the client as a result with isError set"""
+
 class FileServer:
     def __init__(self):
         self.initialized = False
@@ -20,7 +25,9 @@ class FileServer:
                     "properties": {
                         "directory": {"type": "string", "description": "Directory to list", "default": DEFAULT_DIR}
                     }
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "Files in {directory} ({count}): {items}"}
             },
             {
                 "name": "read_file",
@@ -32,7 +39,8 @@ class FileServer:
                         "directory": {"type": "string", "description": "Directory containing the file", "default": DEFAULT_DIR}
                     },
                     "required": ["filename"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False}
             },
             {
                 "name": "write_file",
@@ -45,7 +53,9 @@ class FileServer:
                         "directory": {"type": "string", "description": "Directory to write to", "default": DEFAULT_DIR}
                     },
                     "required": ["filename", "content"]
-                }
+                },
+                "annotations": {"readOnlyHint": False, "destructiveHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{result}."}
             },
             {
                 "name": "delete_file",
@@ -57,7 +67,9 @@ class FileServer:
                         "directory": {"type": "string", "description": "Directory containing the file", "default": DEFAULT_DIR}
                     },
                     "required": ["filename"]
-                }
+                },
+                "annotations": {"readOnlyHint": False, "destructiveHint": True, "idempotentHint": True, "openWorldHint": False},
+                "_meta": {"responseTemplate": "{result}."}
             }
         ]
     
@@ -69,10 +81,10 @@ class FileServer:
             
             path = Path(directory)
             if not path.exists():
-                return [f"Directory {directory} does not exist"]
+                raise ToolError(f"Directory {directory} does not exist")
             
             if not path.is_dir():
-                return [f"{directory} is not a directory"]
+                raise ToolError(f"{directory} is not a directory")
             
             files = []
             for item in path.iterdir():
@@ -81,12 +93,11 @@ class FileServer:
                 elif item.is_dir():
                     files.append(f"{item.name}/")
             
-            if not files:
-                return [f"Directory {directory} is empty"]
-            
             return sorted(files)
+        except ToolError:
+            raise
         except Exception as e:
-            return [f"Error listing files: {str(e)}"]
+            raise ToolError(f"Error listing files: {str(e)}")
     
     def read_file(self, filename: str, directory: str = DEFAULT_DIR) -> str:
         """Read file contents"""
@@ -112,21 +123,23 @@ class FileServer:
             
             return f"Successfully wrote to {filename}"
         except Exception as e:
-            return f"Error writing file: {str(e)}"
+            raise ToolError(f"Error writing file: {str(e)}")
     
     def delete_file(self, filename: str, directory: str = DEFAULT_DIR) -> str:
         """Delete a file"""
         try:
             file_path = Path(directory) / filename
             if not file_path.exists():
-                return f"File {filename} not found in {directory}"
+                raise ToolError(f"File {filename} not found in {directory}")
             
             file_path.unlink()
             return f"Successfully deleted {filename}"
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error deleting file: {str(e)}"
+            raise ToolError(f"Error deleting file: {str(e)}")
     
-    def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Handle JSON-RPC message"""
         method = message.get("method")
         
@@ -148,6 +161,9 @@ class FileServer:
                 }
             }
         
+        elif method == "ping":
+            return {"jsonrpc": "2.0", "id": message.get("id"), "result": {}}
+        
         elif method == "tools/list":
             return {
                 "jsonrpc": "2.0",
@@ -183,7 +199,16 @@ class FileServer:
                         "content": [{"type": "text", "text": str(result)}]
                     }
                 }
-                
+            
+            except ToolError as e:
+                return {
+                    "jsonrpc": "2.0",
+                    "id": message.get("id"),
+                    "result": {
+                        "content": [{"type": "text", "text": str(e)}],
+                        "isError": True
+                    }
+                }
             except Exception as e:
                 return {
                     "jsonrpc": "2.0",
@@ -197,20 +222,63 @@ class FileServer:
                 "id": message.get("id"),
                 "error": {"code": -32601, "message": f"Unknown method: {method}"}
             }
+    
+    def handle_batch(self, messages: List[Any]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Handle a JSON-RPC batch, returning one array of responses (None if all were notifications)"""
+        if not messages:
+            return {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {"code": -32600, "message": "Invalid Request: empty batch"}
+            }
+        
+        responses = []
+        for message in messages:
+            if not isinstance(message, dict):
+                responses.append({
+                    "jsonrpc": "2.0",
+                    "id": None,
+                    "error": {"code": -32600, "message": "Invalid Request"}
+                })
+                continue
+            
+            response = self.handle_message(message)
+            if response is not None:
+                responses.append(response)
+        
+        return responses or None
 
 def main():
     try:
         server = FileServer()
         
+        # Tool calls run on a worker thread so pings are answered while one is in progress
+        executor = ThreadPoolExecutor(max_workers=1)
+        write_lock = threading.Lock()
+        
+        def send(response):
+            if response is not None:
+                with write_lock:
+                    print(json.dumps(response))
+                    sys.stdout.flush()
+        
+        def handle(message):
+            try:
+                if isinstance(message, list):
+                    send(server.handle_batch(message))
+                else:
+                    send(server.handle_message(message))
+            except Exception as e:
+                print(f"Error handling request: {e}", file=sys.stderr)
+        
         for line in sys.stdin:
             try:
                 message = json.loads(line.strip())
-                response = server.handle_message(message)
-                
-                if response is not None:
-                    print(json.dumps(response))
-                    sys.stdout.flush()
-                    
+                if isinstance(message, list) or message.get("method") == "tools/call":
+                    executor.submit(handle, message)
+                else:
+                    send(server.handle_message(message))
+            
             except json.JSONDecodeError:
                 continue
             except Exception as e:
@@ -219,9 +287,10 @@ def main():
                     "id": None,
                     "error": {"code": -32700, "message": f"Parse error: {str(e)}"}
                 }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
-                
+                send(error_response)
+        
+        executor.shutdown(wait=True)
+    
     except Exception as e:
         print(f"Fatal error in file server: {e}", file=sys.stderr)
         sys.exit(1)
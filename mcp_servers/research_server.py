@@ -1,24 +1,46 @@
 #!/usr/bin/env python3
 import sys
 import json
+import threading
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union
 
-# Add error handling for arxiv import
-try:
-    import arxiv
-    ARXIV_AVAILABLE = True
-except ImportError as e:
-    ARXIV_AVAILABLE = False
-    print(f"Warning: arxiv not available: {e}", file=sys.stderr)
+# arxiv is imported on the first search so that spawning the server stays cheap
+arxiv = None
+
+def load_arxiv() -> bool:
+    """Import the arxiv library on first use"""
+    global arxiv
+    if arxiv is None:
+        try:
+            import arxiv as arxiv_module
+        except ImportError as e:
+            print(f"Warning: arxiv not available: {e}", file=sys.stderr)
+            return False
+        arxiv = arxiv_module
+    return True
 
 # Ensure papers directory exists
 PAPER_DIR = "papers"
 os.makedirs(PAPER_DIR, exist_ok=True)
 
+class ToolError(Exception):
+    """A failed tool call, reported to the client as a result with isError set"""
+
 class ResearchServer:
     def __init__(self):
         self.initialized = False
+        # Ids of tool calls read but not yet answered, those of them the client cancelled, and a flag the
+        # running tool call can poll or wait on
+        self.pending_requests = set()
+        self.cancelled_requests = set()
+        self.cancel_lock = threading.Lock()
+        self.current_request_id = None
+        self.cancel_event = threading.Event()
+        # Sends a notification to the client; set by main() or by the host when run in process
+        self.notify = None
+        self.progress_token = None
         self.tools = [
             {
                 "name": "search_papers",
@@ -30,7 +52,9 @@ class ResearchServer:
                         "max_results": {"type": "integer", "description": "Maximum number of results", "default": 5}
                     },
                     "required": ["topic"]
-                }
+                },
+                "annotations": {"readOnlyHint": False, "destructiveHint": False, "idempotentHint": False, "openWorldHint": True},
+                "_meta": {"responseTemplate": "{result}. Ask about any ID for its details."}
             },
             {
                 "name": "extract_info",
@@ -41,16 +65,16 @@ class ResearchServer:
                         "paper_id": {"type": "string", "description": "The ID of the paper"}
                     },
                     "required": ["paper_id"]
-                }
+                },
+                "annotations": {"readOnlyHint": True, "idempotentHint": True, "openWorldHint": False}
             }
         ]
     
     def search_papers(self, topic: str, max_results: int = 5) -> str:
         """Search for papers on arXiv"""
-        if not ARXIV_AVAILABLE:
-            return "Error: arxiv library not available. Please install with: pip install arxiv"
-
-        import time
+        if not load_arxiv():
+            raise ToolError("arxiv library not available. Please install with: pip install arxiv")
+        
         import random
         
         max_retries = 3
@@ -58,10 +82,11 @@ class ResearchServer:
         
         for attempt in range(max_retries):
             try:
-                # Add delay to respect arXiv rate limits
+                # Add delay to respect arXiv rate limits; a cancellation cuts the wait short
                 if attempt > 0:
                     delay = base_delay + random.uniform(1, 3)  # Add jitter
-                    time.sleep(delay)
+                    if self.cancel_event.wait(delay):
+                        return "Search cancelled"
                 
                 client = arxiv.Client()
                 search = arxiv.Search(
@@ -71,6 +96,7 @@ class ResearchServer:
                 )
                 
                 papers = client.results(search)
+                self.report_progress(0, max_results, f"Searching arXiv for '{topic}'")
                 
                 # Create directory for this topic
                 path = os.path.join(PAPER_DIR, topic.lower().replace(" ", "_"))
@@ -87,8 +113,12 @@ class ResearchServer:
                 # Process papers
                 paper_ids = []
                 for paper in papers:
+                    if self.cancel_event.is_set():
+                        return "Search cancelled"
                     paper_id = paper.get_short_id()
                     paper_ids.append(paper_id)
+                    # Paper IDs are streamed as partial results while the rest are fetched
+                    self.report_progress(len(paper_ids), max_results, paper_id)
                     
                     paper_info = {
                         'title': paper.title,
@@ -105,14 +135,14 @@ class ResearchServer:
                     json.dump(papers_info, f, indent=2)
                 
                 return f"Found {len(paper_ids)} papers: {', '.join(paper_ids)}"
-                
+            
             except Exception as e:
                 if attempt == max_retries - 1:  # Last attempt
-                    return f"Error searching papers after {max_retries} attempts: {str(e)}"
+                    raise ToolError(f"Error searching papers after {max_retries} attempts: {str(e)}")
                 else:
                     print(f"Attempt {attempt + 1} failed: {e}. Retrying...", file=sys.stderr)
                     continue
-
+    
     
     def extract_info(self, paper_id: str) -> str:
         """Get information about a specific paper"""
@@ -131,11 +161,66 @@ class ResearchServer:
                             continue
             
             return f"No information found for paper {paper_id}"
-            
+        
         except Exception as e:
             return f"Error extracting info: {str(e)}"
     
-    def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    def report_progress(self, progress: int, total: Optional[int] = None, message: Optional[str] = None):
+        """Send a progress notification for the current tool call, if the client asked for them"""
+        if self.notify is None or self.progress_token is None:
+            return
+        
+        params = {"progressToken": self.progress_token, "progress": progress}
+        if total is not None:
+            params["total"] = total
+        if message is not None:
+            params["message"] = message
+        self.notify({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": params
+        })
+    
+    def receive(self, message: Any):
+        """Note a tool call that was read, so it can be cancelled while it waits for the worker thread"""
+        if isinstance(message, dict) and message.get("method") == "tools/call" and "id" in message:
+            with self.cancel_lock:
+                self.pending_requests.add(message["id"])
+    
+    def cancel(self, request_id: Any):
+        """Mark an unanswered request as cancelled, waking the tool call if it is the one in progress"""
+        with self.cancel_lock:
+            # A cancellation that crossed the response on the wire has nothing left to cancel
+            if request_id not in self.pending_requests:
+                return
+            self.cancelled_requests.add(request_id)
+        if request_id == self.current_request_id:
+            self.cancel_event.set()
+    
+    def handle_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Handle JSON-RPC message, dropping the response to a tool call the client cancelled"""
+        if message.get("method") != "tools/call" or "id" not in message:
+            return self._handle_message(message)
+        
+        request_id = message.get("id")
+        self.receive(message)
+        self.current_request_id = request_id
+        self.progress_token = message.get("params", {}).get("_meta", {}).get("progressToken")
+        self.cancel_event.clear()
+        try:
+            # A call cancelled while it was still queued is skipped entirely
+            response = None if request_id in self.cancelled_requests else self._handle_message(message)
+        finally:
+            self.current_request_id = None
+            self.progress_token = None
+        
+        with self.cancel_lock:
+            self.pending_requests.discard(request_id)
+            cancelled = request_id in self.cancelled_requests
+            self.cancelled_requests.discard(request_id)
+        return None if cancelled else response
+    
+    def _handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Handle JSON-RPC message (request or notification)"""
         method = message.get("method")
         
@@ -143,6 +228,8 @@ class ResearchServer:
         if "id" not in message:
             if method == "notifications/initialized":
                 self.initialized = True
+            elif method == "notifications/cancelled":
+                self.cancel(message.get("params", {}).get("requestId"))
             return None  # No response for notifications
         
         # Handle requests (response needed)
@@ -162,6 +249,13 @@ class ResearchServer:
                 }
             }
         
+        elif method == "ping":
+            return {
+                "jsonrpc": "2.0",
+                "id": message.get("id"),
+                "result": {}
+            }
+        
         elif method == "tools/list":
             return {
                 "jsonrpc": "2.0",
@@ -203,7 +297,21 @@ class ResearchServer:
                         ]
                     }
                 }
-                
+            
+            except ToolError as e:
+                return {
+                    "jsonrpc": "2.0",
+                    "id": message.get("id"),
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": str(e)
+                            }
+                        ],
+                        "isError": True
+                    }
+                }
             except Exception as e:
                 return {
                     "jsonrpc": "2.0",
@@ -223,21 +331,73 @@ class ResearchServer:
                     "message": f"Unknown method: {method}"
                 }
             }
+    
+    def handle_batch(self, messages: List[Any]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Handle a JSON-RPC batch, returning one array of responses (None if all were notifications)"""
+        if not messages:
+            return {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32600,
+                    "message": "Invalid Request: empty batch"
+                }
+            }
+        
+        responses = []
+        for message in messages:
+            if not isinstance(message, dict):
+                responses.append({
+                    "jsonrpc": "2.0",
+                    "id": None,
+                    "error": {
+                        "code": -32600,
+                        "message": "Invalid Request"
+                    }
+                })
+                continue
+            
+            response = self.handle_message(message)
+            if response is not None:
+                responses.append(response)
+        
+        return responses or None
 
 def main():
     try:
         server = ResearchServer()
         
+        # Tool calls run on a worker thread so cancellations are read while one is in progress
+        executor = ThreadPoolExecutor(max_workers=1)
+        write_lock = threading.Lock()
+        
+        def send(response):
+            if response is not None:
+                with write_lock:
+                    print(json.dumps(response))
+                    sys.stdout.flush()
+        
+        server.notify = send
+        
+        def handle(message):
+            try:
+                if isinstance(message, list):
+                    send(server.handle_batch(message))
+                else:
+                    send(server.handle_message(message))
+            except Exception as e:
+                print(f"Error handling request: {e}", file=sys.stderr)
+        
         for line in sys.stdin:
             try:
                 message = json.loads(line.strip())
-                response = server.handle_message(message)
-                
-                # Only send response if it's not None (i.e., not a notification)
-                if response is not None:
-                    print(json.dumps(response))
-                    sys.stdout.flush()
-                    
+                if isinstance(message, list) or message.get("method") == "tools/call":
+                    for item in message if isinstance(message, list) else [message]:
+                        server.receive(item)
+                    executor.submit(handle, message)
+                else:
+                    send(server.handle_message(message))
+            
             except json.JSONDecodeError:
                 continue
             except Exception as e:
@@ -249,9 +409,10 @@ def main():
                         "message": f"Parse error: {str(e)}"
                     }
                 }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
-                
+                send(error_response)
+        
+        executor.shutdown(wait=True)
+    
     except Exception as e:
         print(f"Fatal error in research server: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The chatbot modules import each other as top-level modules, as when run from chatbot/
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "chatbot"))
+sys.path.insert(0, str(ROOT / "mcp_servers"))
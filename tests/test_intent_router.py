@@ -0,0 +1,22 @@
+import pytest
+
+from intent_router import is_multi_step
+
+@pytest.mark.parametrize("text", [
+    "sum two and five",
+    "multiply 3 and 4",
+    "add 2 and 3",
+    "list files in docs, please",
+    "search papers about transformers and attention",
+])
+def test_single_step_requests(text):
+    assert not is_multi_step(text)
+
+@pytest.mark.parametrize("text", [
+    "search papers on transformers then extract info on the top result",
+    "search papers on X, get the details of the top one and save a summary to notes.txt",
+    "search papers on AI and compute 2^10",
+    "read notes.txt and then summarize it",
+])
+def test_multi_step_requests(text):
+    assert is_multi_step(text)
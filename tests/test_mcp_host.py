@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from mcp_host import MCPServerPool
+
+SLOW_SERVER = '''
+import time
+
+class SlowServer:
+    def handle_message(self, message):
+        if "id" not in message:
+            return None
+        method = message.get("method")
+        if method == "initialize":
+            result = {"protocolVersion": "2024-11-05", "capabilities": {"tools": {}},
+                      "serverInfo": {"name": "slow", "version": "1.0.0"}}
+        elif method == "tools/list":
+            result = {"tools": [{"name": "wait", "inputSchema": {"type": "object", "properties": {}}}]}
+        else:
+            time.sleep(0.3)
+            result = {"content": [{"type": "text", "text": str(id(self))}]}
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+'''
+
+def test_burst_spreads_across_workers(tmp_path):
+    module = tmp_path / "slow_server.py"
+    module.write_text(SLOW_SERVER)
+    
+    async def burst():
+        pool = MCPServerPool("slow", {"transport": "inprocess", "module": str(module),
+                                      "pool_size": {"min": 1, "max": 3}})
+        await pool.start()
+        try:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(pool.call_tool("wait", {}) for _ in range(6)))
+            return responses, time.perf_counter() - started, len(pool.workers)
+        finally:
+            await pool.stop()
+    
+    responses, elapsed, workers = asyncio.run(burst())
+    instances = {response["result"]["content"][0]["text"] for response in responses}
+    assert workers > 1
+    assert len(instances) > 1
+    # One worker alone would take 6 x 0.3s
+    assert elapsed < 1.5
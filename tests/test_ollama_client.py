@@ -0,0 +1,67 @@
+import asyncio
+
+from aiohttp import web
+
+from llm_scheduler import LLMScheduler
+from ollama_client import OllamaBackend, OllamaClient
+
+class StandIn:
+    """Local stand-in for an Ollama server that records how many chats it serves at once"""
+    
+    def __init__(self, counters):
+        self.counters = counters
+        self.active = 0
+        self.peak = 0
+    
+    async def chat(self, request):
+        self.active += 1
+        self.counters["active"] += 1
+        self.peak = max(self.peak, self.active)
+        self.counters["peak"] = max(self.counters["peak"], self.counters["active"])
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            self.active -= 1
+            self.counters["active"] -= 1
+        return web.json_response({"message": {"role": "assistant", "content": "ok"}, "done": True})
+
+async def start_stand_in(stand_in):
+    app = web.Application()
+    app.router.add_post("/api/chat", stand_in.chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def test_two_backends_double_the_in_flight_limit():
+    async def run():
+        counters = {"active": 0, "peak": 0}
+        stand_ins = [StandIn(counters), StandIn(counters)]
+        started = [await start_stand_in(stand_in) for stand_in in stand_ins]
+        client = OllamaClient(
+            backends=[OllamaBackend(url, "llama3.2") for _, url in started],
+            max_connections=2,
+            scheduler=LLMScheduler(max_in_flight=2)
+        )
+        try:
+            replies = await asyncio.gather(*(client.chat([{"role": "user", "content": "hi"}]) for _ in range(8)))
+        finally:
+            await client.close()
+            for runner, _ in started:
+                await runner.cleanup()
+        return replies, counters["peak"], [stand_in.peak for stand_in in stand_ins]
+    
+    replies, peak, per_backend = asyncio.run(run())
+    assert replies == ["ok"] * 8
+    assert peak == 4
+    assert per_backend == [2, 2]
+
+def test_limit_follows_healthy_backends():
+    scheduler = LLMScheduler(max_in_flight=2, backends=3)
+    assert scheduler.max_in_flight == 6
+    scheduler.set_backends(1)
+    assert scheduler.max_in_flight == 2
+    scheduler.set_backends(0)
+    assert scheduler.max_in_flight == 2
@@ -0,0 +1,34 @@
+from file_server import FileServer
+from result_renderer import ResultRenderer
+
+def call_list_files(server, directory):
+    return server.handle_message({"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                                  "params": {"name": "list_files", "arguments": {"directory": directory}}})["result"]
+
+def renderer(server, **options):
+    return ResultRenderer(lambda: {"file": server.tools}, **options)
+
+def test_empty_directory_renders_as_empty_listing(tmp_path):
+    server = FileServer()
+    result = call_list_files(server, str(tmp_path))
+    assert not result.get("isError")
+    text = result["content"][0]["text"]
+    assert renderer(server).render("file", "list_files", {"directory": str(tmp_path)}, text) == \
+        f"Files in {tmp_path} (0): none"
+
+def test_missing_directory_is_a_tool_error(tmp_path):
+    server = FileServer()
+    missing = str(tmp_path / "missing")
+    result = call_list_files(server, missing)
+    assert result["isError"]
+    assert result["content"][0]["text"] == f"Directory {missing} does not exist"
+
+def test_tool_errors_are_not_templated():
+    server = FileServer()
+    message = "Directory /x does not exist"
+    # With the LLM fallback the model explains the error; without it the error is shown as such
+    assert renderer(server).render_error("file", "list_files", message) is None
+    assert renderer(server, llm_fallback=False).render_error("file", "list_files", message) == \
+        f"Tool call failed with error: {message}"
+    assert renderer(server).render_error("file", "list_files", message, allow_llm=False) == \
+        f"Tool call failed with error: {message}"
@@ -0,0 +1,17 @@
+from research_server import ResearchServer
+
+def cancel_message(request_id):
+    return {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": request_id}}
+
+def test_late_cancellation_is_ignored():
+    server = ResearchServer()
+    server.handle_message(cancel_message(41))
+    assert not server.cancelled_requests
+
+def test_queued_call_cancelled_is_skipped():
+    server = ResearchServer()
+    call = {"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "extract_info", "arguments": {"paper_id": "x"}}}
+    server.receive(call)
+    server.handle_message(cancel_message(7))
+    assert server.handle_message(call) is None
+    assert not server.pending_requests and not server.cancelled_requests